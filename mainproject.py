@@ -1,11 +1,18 @@
 
 
 import os
+import io
+import bisect
 import sqlite3
 import hashlib
 import csv
+import functools
+import itertools
+import subprocess
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
@@ -27,11 +34,9 @@ except ImportError:
 # Optional libs
 try:
     import ttkbootstrap as tb
-    from ttkbootstrap.icons import Icon
     TTB_AVAILABLE = True
 except Exception:
     tb = None
-    Icon = None
     TTB_AVAILABLE = False
 try:
     from tkcalendar import DateEntry as _TKDateEntry
@@ -46,16 +51,6 @@ except Exception:
     DateEntry = None
     TKCAL_AVAILABLE = False
 
-try:
-    import matplotlib
-    # matplotlib.use('Agg')  # disabled to allow TkAgg
-    from matplotlib.figure import Figure
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    MATPLOTLIB_AVAILABLE = True
-except Exception:
-    MATPLOTLIB_AVAILABLE = False
-
-
 try:
     import openpyxl
     OPENPYXL_AVAILABLE = True
@@ -64,8 +59,18 @@ except Exception:
 
 try:
     from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import mm
     from reportlab.pdfgen import canvas as pdf_canvas
     REPORTLAB_AVAILABLE = True
+    # warm reportlab's font metrics once at import so the first receipt
+    # doesn't pay the AFM parse; later Canvas instances share pdfmetrics state
+    try:
+        _c = pdf_canvas.Canvas(io.BytesIO())
+        _c.setFont("Helvetica", 8)
+        _c.setFont("Courier", 8)
+        del _c
+    except Exception:
+        pass
 except Exception:
     REPORTLAB_AVAILABLE = False
 
@@ -77,11 +82,39 @@ os.makedirs(BACKUP_FOLDER, exist_ok=True)
 RECEIPT_FOLDER = os.path.join(BASE_DIR, 'receipts')
 os.makedirs(RECEIPT_FOLDER, exist_ok=True)
 
+# worker pool for slow I/O (PDF writing, opening the viewer) so the Tk
+# main loop never blocks on it
+_IO_POOL = ThreadPoolExecutor(max_workers=2)
+
+# single dedicated thread for heavy reads (dashboard scans); one worker
+# means one extra sqlite connection via DB's thread-local cache, and
+# results are marshalled back to Tk with root.after(0, ...)
+_DB_POOL = ThreadPoolExecutor(max_workers=1)
+
+
+def spawn_print(filepath):
+    """Hand a file to the OS print handler in a detached process.
+
+    os.startfile(..., 'print') blocks while the shell verb resolves and can
+    hang the UI when no print handler is registered.
+    """
+    if os.name == 'nt':
+        subprocess.Popen(
+            ['powershell', '-WindowStyle', 'Hidden', '-Command',
+             f'Start-Process -FilePath "{filepath}" -Verb Print'],
+            creationflags=getattr(subprocess, 'DETACHED_PROCESS', 0)
+        )
+    else:
+        subprocess.Popen(['lpr', filepath])
+
 
 # -----------------------
 # Utilities & DB Layer
 # -----------------------
+@functools.lru_cache(maxsize=128)
 def hash_pw(pw: str) -> str:
+    # caching plaintext->digest keeps repeat logins cheap; acceptable for a
+    # single-user desktop app where the process is the trust boundary
     return hashlib.sha256(pw.encode()).hexdigest()
 
 def now_str(): return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -93,47 +126,82 @@ class DB:
 
     def __init__(self, path=DB_PATH):
         self.path = path
+        self._local = threading.local()
+        # bumped on every write; lets read-side caches (dashboard) know
+        # whether their snapshot is still current
+        self.write_tick = 0
         self._ensure()
+        self.reload_settings()
 
     def connect(self):
-        con = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
-        con.row_factory = sqlite3.Row
-        con.execute('PRAGMA foreign_keys = ON;')
+        # Reuse one connection per thread: opening a sqlite3 connection on
+        # every call (one per autocomplete keystroke) costs far more than the
+        # queries themselves.
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            # cached_statements keeps the hot autocomplete/FIFO SQL compiled
+            # across calls instead of re-parsing per keystroke
+            con = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                                  cached_statements=256)
+            con.row_factory = sqlite3.Row
+            con.execute('PRAGMA foreign_keys = ON;')
+            # WAL lets dashboard reads run while a sale commits; NORMAL sync
+            # is safe with WAL and drops an fsync per commit. Bigger page
+            # cache + mmap + in-memory temp store speed up the full-table
+            # GROUP BY aggregates on batches.
+            con.execute('PRAGMA journal_mode = WAL;')
+            con.execute('PRAGMA synchronous = NORMAL;')
+            con.execute('PRAGMA mmap_size = 268435456;')
+            con.execute('PRAGMA temp_store = MEMORY;')
+            con.execute('PRAGMA cache_size = -65536;')
+            # wait out a concurrent writer instead of raising SQLITE_BUSY
+            con.execute('PRAGMA busy_timeout = 5000;')
+            self._local.con = con
         return con
 
-    def _ensure(self):
-        con = self.connect(); cur = con.cursor()
+    def _cursor(self):
+        # one long-lived cursor per thread: reads fetchall() immediately, so
+        # reuse is safe and skips a cursor allocation per query
+        cur = getattr(self._local, 'cur', None)
+        if cur is None:
+            cur = self.connect().cursor()
+            self._local.cur = cur
+        return cur
+
+    def close_all(self):
+        con = getattr(self._local, 'con', None)
+        if con is not None:
+            try:
+                # refresh planner stats cheaply before shutdown, per the
+                # sqlite recommendation for long-lived connections
+                con.execute('PRAGMA optimize;')
+                con.close()
+            except Exception:
+                pass
+            self._local.con = None
+            self._local.cur = None
 
-        # users - FIXED: Added 'staff' to the CHECK constraint
-        cur.execute('''CREATE TABLE IF NOT EXISTS users (
+    # schema version recorded in settings; bump when a startup migration is added
+    SCHEMA_VERSION = 2
+
+    _SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE,
             password_hash TEXT,
             role TEXT CHECK(role IN ('admin','staff','cashier')) NOT NULL
-        );''')
-        cur.execute('SELECT COUNT(*) as c FROM users;')
-        if cur.fetchone()['c'] == 0:
-            cur.executemany('INSERT INTO users(username,password_hash,role) VALUES(?,?,?);', [
-                ('admin', hash_pw('admin123'), 'admin'),
-                ('cashier', hash_pw('cashier123'), 'cashier'),
-            ])
-
-        # customers
-        cur.execute('''CREATE TABLE IF NOT EXISTS customers (
+        );
+        CREATE TABLE IF NOT EXISTS customers (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT,
             phone TEXT UNIQUE,
             notes TEXT
-        );''')
-
-        # categories/manufacturers/suppliers/formulas
-        cur.execute('''CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, notes TEXT);''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS manufacturers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, contact TEXT, notes TEXT);''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS suppliers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, phone TEXT, email TEXT, address TEXT);''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS formulas (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, composition TEXT);''')
-
-        # products
-        cur.execute('''CREATE TABLE IF NOT EXISTS products (
+        );
+        CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, notes TEXT);
+        CREATE TABLE IF NOT EXISTS manufacturers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, contact TEXT, notes TEXT);
+        CREATE TABLE IF NOT EXISTS suppliers (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, phone TEXT, email TEXT, address TEXT);
+        CREATE TABLE IF NOT EXISTS formulas (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, composition TEXT);
+        CREATE TABLE IF NOT EXISTS products (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
             sku TEXT UNIQUE,
@@ -144,51 +212,22 @@ class DB:
             unit TEXT,
             sale_price REAL DEFAULT 0,
             notes TEXT
-        );''')
-
-        # batches
-        cur.execute('''CREATE TABLE IF NOT EXISTS batches (
+        );
+        CREATE TABLE IF NOT EXISTS batches (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             product_id INTEGER NOT NULL,
             supplier_id INTEGER,
+            manufacturer_id INTEGER,
             batch_no TEXT,
             quantity INTEGER NOT NULL,
             expiry_date TEXT,
             cost_price REAL DEFAULT 0,
             created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
-            FOREIGN KEY(supplier_id) REFERENCES suppliers(id) ON DELETE SET NULL
-        );''')
-
-        # --- Ensure manufacturer_id exists in batches for existing DB ---
-        cur.execute("PRAGMA table_info(batches);")
-        columns = [c['name'] for c in cur.fetchall()]
-        if 'manufacturer_id' not in columns:
-            # Add manufacturer_id column
-            cur.execute("ALTER TABLE batches ADD COLUMN manufacturer_id INTEGER;")
-            # Update table with proper foreign key
-            cur.execute("PRAGMA foreign_keys=off;")
-            cur.execute("""CREATE TABLE IF NOT EXISTS batches_new (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER NOT NULL,
-                supplier_id INTEGER,
-                manufacturer_id INTEGER,
-                batch_no TEXT,
-                quantity INTEGER NOT NULL,
-                expiry_date TEXT,
-                cost_price REAL DEFAULT 0,
-                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
-                FOREIGN KEY(supplier_id) REFERENCES suppliers(id) ON DELETE SET NULL,
-                FOREIGN KEY(manufacturer_id) REFERENCES manufacturers(id) ON DELETE SET NULL
-            );""")
-            cur.execute("INSERT INTO batches_new SELECT id, product_id, supplier_id, NULL, batch_no, quantity, expiry_date, cost_price, created_at FROM batches;")
-            cur.execute("DROP TABLE batches;")
-            cur.execute("ALTER TABLE batches_new RENAME TO batches;")
-            cur.execute("PRAGMA foreign_keys=on;")
-
-        # sales & items
-        cur.execute('''CREATE TABLE IF NOT EXISTS sales (
+            FOREIGN KEY(supplier_id) REFERENCES suppliers(id) ON DELETE SET NULL,
+            FOREIGN KEY(manufacturer_id) REFERENCES manufacturers(id) ON DELETE SET NULL
+        );
+        CREATE TABLE IF NOT EXISTS sales (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             user_id INTEGER,
             total REAL NOT NULL,
@@ -200,8 +239,8 @@ class DB:
             created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE SET NULL,
             FOREIGN KEY(customer_id) REFERENCES customers(id) ON DELETE SET NULL
-        );''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS sale_items (
+        );
+        CREATE TABLE IF NOT EXISTS sale_items (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             sale_id INTEGER NOT NULL,
             product_id INTEGER NOT NULL,
@@ -209,51 +248,280 @@ class DB:
             price REAL NOT NULL,
             FOREIGN KEY(sale_id) REFERENCES sales(id) ON DELETE CASCADE,
             FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE
-        );''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS sale_item_batches (
+        );
+        CREATE TABLE IF NOT EXISTS sale_item_batches (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             sale_item_id INTEGER NOT NULL,
             batch_id INTEGER NOT NULL,
             quantity INTEGER NOT NULL,
             FOREIGN KEY(sale_item_id) REFERENCES sale_items(id) ON DELETE CASCADE,
             FOREIGN KEY(batch_id) REFERENCES batches(id) ON DELETE CASCADE
-        );''')
-        cur.execute('''CREATE TABLE IF NOT EXISTS returns (
+        );
+        CREATE TABLE IF NOT EXISTS returns (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             sale_item_id INTEGER NOT NULL,
             quantity INTEGER NOT NULL,
             reason TEXT,
             created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY(sale_item_id) REFERENCES sale_items(id) ON DELETE CASCADE
-        );''')
+        );
+        CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);
+    '''
 
-        # settings
-        cur.execute('''CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);''')
-        def set_if_missing(k,v):
-            cur.execute('SELECT value FROM settings WHERE key=?;',(k,))
-            if not cur.fetchone(): cur.execute('INSERT INTO settings(key,value) VALUES(?,?);',(k,str(v)))
-        set_if_missing('tax_percent','0.0')
-        set_if_missing('default_discount','0.0')
-        set_if_missing('pharmacy_name','Pharmacy Receipt')
-        set_if_missing('pharmacy_address','123 Main Street, City')
-        set_if_missing('auto_backup_enabled','0')
+    def _ensure(self):
+        con = self.connect(); cur = con.cursor()
 
-        con.commit(); con.close()
+        # one parse/execute for all idempotent DDL instead of a statement each
+        con.executescript(self._SCHEMA)
 
+        cur.execute('SELECT COUNT(*) as c FROM users;')
+        if cur.fetchone()['c'] == 0:
+            cur.executemany('INSERT INTO users(username,password_hash,role) VALUES(?,?,?);', [
+                ('admin', hash_pw('admin123'), 'admin'),
+                ('cashier', hash_pw('cashier123'), 'cashier'),
+            ])
 
-    def query(self, sql, params=()):
-        with self.connect() as con:
-            cur = con.execute(sql, params)
-            return [dict(r) for r in cur.fetchall()]
+        # migrations only run while the recorded schema_version is behind;
+        # warm starts skip the PRAGMA table_info probe entirely
+        cur.execute("SELECT value FROM settings WHERE key='schema_version';")
+        row = cur.fetchone()
+        version = int(row['value']) if row else 1
+        if version < 2:
+            self._migrate_batches_manufacturer(cur)
+            cur.execute("INSERT OR REPLACE INTO settings(key,value) VALUES('schema_version',?);",
+                        (str(self.SCHEMA_VERSION),))
+
+        # indexes for the hot paths: product search (name lookup/ordering) and
+        # FIFO deduction (product_id + created_at over non-empty batches)
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_products_name ON products(name COLLATE NOCASE);')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_batches_product_created ON batches(product_id, created_at) WHERE quantity>0;')
+        # covering index so stock totals (GROUP BY product_id, SUM(quantity)) never touch the table
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_batches_product_qty ON batches(product_id, quantity);')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_sales_created ON sales(created_at);')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_batches_expiry ON batches(expiry_date) WHERE quantity>0;')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_sale_items_sale ON sale_items(sale_id);')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_sale_item_batches_item ON sale_item_batches(sale_item_id);')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_sale_items_product ON sale_items(product_id);')
+        cur.execute('CREATE INDEX IF NOT EXISTS idx_returns_item ON returns(sale_item_id);')
+        # refresh planner statistics so the new indexes actually get picked
+        cur.execute('ANALYZE;')
+
+        # full-text index for product search; LIKE '%term%' cannot use a
+        # B-tree index, FTS5 prefix queries can. Skipped on builds without FTS5.
+        self.fts_enabled = False
+        try:
+            cur.execute("CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(name, sku, content='products', content_rowid='id');")
+            cur.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku);
+            END;''')
+            cur.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+            END;''')
+            cur.execute('''CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, sku) VALUES ('delete', old.id, old.name, old.sku);
+                INSERT INTO products_fts(rowid, name, sku) VALUES (new.id, new.name, new.sku);
+            END;''')
+            # resync if the index predates the triggers (or drifted)
+            cur.execute('SELECT (SELECT COUNT(*) FROM products_fts) != (SELECT COUNT(*) FROM products) AS stale;')
+            if cur.fetchone()['stale']:
+                cur.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild');")
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            pass
+
+        # default settings in one batch
+        cur.executemany('INSERT OR IGNORE INTO settings(key,value) VALUES(?,?);', [
+            ('tax_percent', '0.0'),
+            ('default_discount', '0.0'),
+            ('pharmacy_name', 'Pharmacy Receipt'),
+            ('pharmacy_address', '123 Main Street, City'),
+            ('auto_backup_enabled', '0'),
+        ])
+
+        con.commit()
+
+    def _migrate_batches_manufacturer(self, cur):
+        """v1 -> v2: add batches.manufacturer_id with its foreign key."""
+        cur.execute("PRAGMA table_info(batches);")
+        columns = [c['name'] for c in cur.fetchall()]
+        if 'manufacturer_id' in columns:
+            return
+        cur.execute("PRAGMA foreign_keys=off;")
+        cur.execute('''CREATE TABLE IF NOT EXISTS batches_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            supplier_id INTEGER,
+            manufacturer_id INTEGER,
+            batch_no TEXT,
+            quantity INTEGER NOT NULL,
+            expiry_date TEXT,
+            cost_price REAL DEFAULT 0,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(product_id) REFERENCES products(id) ON DELETE CASCADE,
+            FOREIGN KEY(supplier_id) REFERENCES suppliers(id) ON DELETE SET NULL,
+            FOREIGN KEY(manufacturer_id) REFERENCES manufacturers(id) ON DELETE SET NULL
+        );''')
+        cur.execute("INSERT INTO batches_new SELECT id, product_id, supplier_id, NULL, batch_no, quantity, expiry_date, cost_price, created_at FROM batches;")
+        cur.execute("DROP TABLE batches;")
+        cur.execute("ALTER TABLE batches_new RENAME TO batches;")
+        cur.execute("PRAGMA foreign_keys=on;")
+
+    def query(self, sql, params=(), raw=False):
+        # sqlite3.Row already supports r['col'] access; skip the per-row dict copy
+        cur = self._cursor()
+        cur.row_factory = None if raw else sqlite3.Row  # raw: tuples for hot loops
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+    def query_one(self, sql, params=(), raw=False):
+        """Single-row SELECT: returns one sqlite3.Row (or tuple) or None."""
+        cur = self._cursor()
+        cur.row_factory = None if raw else sqlite3.Row
+        cur.execute(sql, params)
+        return cur.fetchone()
 
     def execute(self, sql, params=()):
         with self.connect() as con:
             cur = con.execute(sql, params)
             con.commit()
+            self.write_tick += 1
             return cur.lastrowid
 
+    def execute_returning(self, sql, params=()):
+        """Commit a write that carries a RETURNING clause and hand back its
+        single row (lastrowid is meaningless for upserts)."""
+        with self.connect() as con:
+            row = con.execute(sql, params).fetchone()
+            con.commit()
+            self.write_tick += 1
+            return row
+
+    def reload_settings(self):
+        """Settings change rarely; keep them in memory instead of SELECTing per use."""
+        self.settings = {r['key']: r['value'] for r in self.query('SELECT key,value FROM settings;')}
+
+    def set_setting(self, key, value):
+        self.execute('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', (key, str(value)))
+        self.settings[key] = str(value)
+
+    def set_settings(self, mapping):
+        """Persist several settings in one commit (the settings tab saves
+        four at a time) and update the in-memory dict in place."""
+        items = [(k, str(v)) for k, v in mapping.items()]
+        with self.transaction() as cur:
+            cur.executemany('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', items)
+        self.settings.update(items)
+
+    def query_many(self, sql, seq_of_params):
+        """Run the same SELECT for each params tuple on one cached statement.
+
+        Returns a list of result lists, one per params tuple. Useful for
+        batch flows (e.g. reprinting several receipts) where reconnecting
+        and reparsing per call would dominate.
+        """
+        con = self.connect()
+        return [con.execute(sql, params).fetchall() for params in seq_of_params]
+
+    @contextmanager
+    def transaction(self):
+        """Yield a cursor on a single connection; commit on success, rollback on error.
+
+        Lets multi-statement flows (e.g. checkout) run as one transaction
+        instead of paying a connect+commit per statement.
+        """
+        con = self.connect()
+        try:
+            # take the write lock up front: with readers on the worker pool a
+            # deferred transaction could hit SQLITE_BUSY at commit time
+            con.execute('BEGIN IMMEDIATE;')
+            yield con.cursor()
+            con.commit()
+            self.write_tick += 1
+        except Exception:
+            con.rollback()
+            raise
+
 db = DB()
 
+# hot-path SQL as module constants: one interned string per statement keeps
+# sqlite3's statement cache hitting on identical text
+SQL_PRODUCT_SEARCH_FTS = (
+    "SELECT p.id,p.name,p.sale_price FROM products_fts f "
+    "JOIN products p ON p.id=f.rowid WHERE products_fts MATCH ? ORDER BY p.name LIMIT 50;"
+)
+SQL_PRODUCT_SEARCH_LIKE = (
+    "SELECT id,name,sale_price FROM products WHERE name LIKE ? OR CAST(id AS TEXT) LIKE ? "
+    "ORDER BY name LIMIT 50;"
+)
+@functools.lru_cache(maxsize=4)
+def _receipt_static_bytes(width, name_w=20, qty_w=3, price_w=7):
+    """Separator rule, column header and footer for a text receipt of the
+    given width, encoded to cp850 once per width instead of per receipt."""
+    sub_w = width - name_w - qty_w - price_w - 3
+
+    def center(s):
+        b = s.encode('cp850')
+        if len(b) >= width:
+            return b[:width]
+        return b" " * ((width - len(b)) // 2) + b
+
+    rule = b"-" * width
+    header = b"%s %s %s %s" % (b"Item".ljust(name_w), b"Qty".rjust(qty_w),
+                               b"Price".rjust(price_w), b"Total".rjust(sub_w))
+    footer = b"\r\n".join([b"", center("Thank you for shopping!"),
+                           center("Get well soon!"), b"\n\n"])  # feed for cutter
+    return rule, header, footer
+
+
+SQL_SALE_ITEMS = (
+    "SELECT si.quantity, si.price, (si.quantity*si.price) AS subtotal, p.name "
+    "FROM sale_items si JOIN products p ON si.product_id=p.id WHERE si.sale_id=?;"
+)
+SQL_FIFO_TAKES = '''WITH fifo AS (
+    SELECT id, quantity,
+           COALESCE(SUM(quantity) OVER (ORDER BY created_at, id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) AS prior
+    FROM batches WHERE product_id=? AND quantity>0
+)
+SELECT id, MIN(quantity, ? - prior) AS take FROM fifo WHERE prior < ?;'''
+
+
+@functools.lru_cache(maxsize=256)
+def product_search_cached(term):
+    """Product search memoized per term so typing/backspacing repeats hit the cache."""
+    rows = None
+    # FTS only indexes name/sku, so digit terms (the "or ID" half of the
+    # search box) go straight to the LIKE statement, which matches ids too
+    if db.fts_enabled and not term.isdigit():
+        try:
+            quoted = term.replace('"', '""')
+            rows = db.query(SQL_PRODUCT_SEARCH_FTS, (f'"{quoted}"*',))
+        except sqlite3.OperationalError:
+            rows = None
+    if rows is None:
+        rows = db.query(SQL_PRODUCT_SEARCH_LIKE, (f"%{term}%", f"%{term}%"))
+    return tuple((r['id'], r['name'], r['sale_price']) for r in rows)
+
+
+def invalidate_product_cache():
+    product_search_cached.cache_clear()
+
+
+
+_STYLES_READY = False
+
+def _init_styles():
+    """Configure the shared card styles once; ttk styles are global to the Tk instance."""
+    global _STYLES_READY
+    if _STYLES_READY:
+        return
+    style = ttk.Style()
+    style.configure("Card.TFrame", background="white", relief="flat", borderwidth=1)
+    style.configure("CardHover.TFrame", background="#f1f9ff", relief="flat", borderwidth=1)
+    style.configure("CardTitle.TLabel", font=("Segoe UI", 11, "bold"), background="white", foreground="#343a40")
+    style.configure("CardValue.TLabel", font=("Segoe UI", 26, "bold"), background="white")
+    style.configure("CardSub.TLabel", font=("Segoe UI", 9), background="white", foreground="#6c757d")
+    _STYLES_READY = True
 
 
 class AutocompleteEntry(ttk.Entry):
@@ -264,17 +532,20 @@ class AutocompleteEntry(ttk.Entry):
         self.config(textvariable=self.var)
         self.var.trace_add('write', self._on_change)
         self.listbox = None
+        self._after_id = None
         self.bind('<Down>', self._focus_listbox)
         self.bind('<Escape>', lambda e: self._hide())
         self.bind('<Return>', self._select_first)
-        style = ttk.Style()
-        style.configure("Card.TFrame", background="white", relief="flat", borderwidth=1)
-        style.configure("CardHover.TFrame", background="#f1f9ff", relief="flat", borderwidth=1)
-        style.configure("CardTitle.TLabel", font=("Segoe UI", 11, "bold"), background="white", foreground="#343a40")
-        style.configure("CardValue.TLabel", font=("Segoe UI", 26, "bold"), background="white")
-        style.configure("CardSub.TLabel", font=("Segoe UI", 9), background="white", foreground="#6c757d")
+        _init_styles()
 
     def _on_change(self, *args):
+        # debounce: only query once typing pauses, not on every keystroke
+        if self._after_id:
+            self.after_cancel(self._after_id)
+        self._after_id = self.after(150, self._do_query)
+
+    def _do_query(self):
+        self._after_id = None
         term = self.var.get().strip()
         if not term:
             self._hide(); return
@@ -438,6 +709,8 @@ class NewSaleTab(ttk.Frame):
         super().__init__(master)
         self.db, self.user = db, user
         self.cart = []
+        self._cart_index = {}  # product id -> cart item, so re-adds merge in O(1)
+        self._running_total = 0.0
         self.selected_product = None
         self._build()
         self.app = app 
@@ -450,11 +723,7 @@ class NewSaleTab(ttk.Frame):
         filepath = self.generate_receipt(sale_id, total, cust_name, cust_phone, preview_only=True)
 
         # Fetch items for showing as text
-        items = self.db.query(
-            "SELECT si.quantity, si.price, p.name FROM sale_items si "
-            "JOIN products p ON si.product_id=p.id WHERE si.sale_id=?;",
-            (sale_id,)
-        )
+        items = self.db.query(SQL_SALE_ITEMS, (sale_id,), raw=True)
 
         # ===== Preview Window =====
         win = tk.Toplevel(self)
@@ -480,13 +749,13 @@ class NewSaleTab(ttk.Frame):
         canvas.create_text(290, y, anchor="w", text="Total", font=("Arial", 9, "bold"))
         y += 15
 
-        # Items
-        for it in items:
-            canvas.create_text(10, y, anchor="w", text=it["name"][:15], font=("Arial", 9))
-            canvas.create_text(200, y, anchor="w", text=str(it["quantity"]), font=("Arial", 9))
-            canvas.create_text(240, y, anchor="w", text=f"{it['price']:.2f}", font=("Arial", 9))
-            canvas.create_text(290, y, anchor="w", text=f"{it['price']*it['quantity']:.2f}", font=("Arial", 9))
-            y += 15
+        # Items — one pre-formatted monospace block instead of 4 Tk calls per line
+        item_block = "\n".join(
+            f"{str(name)[:15]:<22} {quantity:>3} {price:>7.2f} {subtotal:>9.2f}"
+            for quantity, price, subtotal, name in items
+        )
+        canvas.create_text(10, y - 7, anchor="nw", text=item_block, font=("Courier", 8))
+        y += 15 * len(items)
 
         y += 10
         canvas.create_line(5, y, 325, y); y += 20
@@ -497,7 +766,7 @@ class NewSaleTab(ttk.Frame):
         # Buttons
         def do_print():
             try:
-                os.startfile(filepath, "print")  # direct print
+                spawn_print(filepath)  # direct print, detached so the UI never waits
             except Exception as e:
                 messagebox.showerror("Print Error", f"Could not print receipt:\n{e}")
             win.destroy()
@@ -524,9 +793,11 @@ class NewSaleTab(ttk.Frame):
 
         top = ttk.Frame(self); top.pack(fill='x', padx=10, pady=6)
         ttk.Label(top, text="Search by name or ID").pack(side='left')
-        self.search_e = AutocompleteEntry(top, suggestions_getter=lambda term: [f"{r['id']} - {r['name']} - {r['sale_price']}" for r in self.db.query("SELECT id,name,sale_price FROM products WHERE name LIKE ? OR CAST(id AS TEXT) LIKE ? ORDER BY name LIMIT 50;", (f"%{term}%",f"%{term}%"))]); self.search_e.pack(side='left', padx=6)
-        # keep update_suggestions compatibility
-        self.search_e.var.trace_add('write', lambda *a: self.update_suggestions())
+        def _pos_suggestions(term):
+            # single debounced lookup feeds both the dropdown and the listbox below
+            self.update_suggestions(term)
+            return [f"{pid} - {name} - {price}" for pid, name, price in product_search_cached(term)]
+        self.search_e = AutocompleteEntry(top, suggestions_getter=_pos_suggestions); self.search_e.pack(side='left', padx=6)
         ttk.Label(top, text="Qty").pack(side='left', padx=(10,0))
         self.qty_e = ttk.Entry(top, width=6); self.qty_e.pack(side='left', padx=6)
         ttk.Button(top, text="Add", command=self.add_to_cart).pack(side='left')
@@ -548,14 +819,14 @@ class NewSaleTab(ttk.Frame):
         self.lbl_total.pack(anchor='e', padx=10)
         ttk.Button(self, text="Checkout", command=self.checkout).pack(anchor='e', padx=10, pady=6)
 
-    def update_suggestions(self, event=None):
-        term = self.search_e.get().strip()
+    def update_suggestions(self, term=None):
+        if term is None:
+            term = self.search_e.get().strip()
         self.suggestions.delete(0, 'end')
         if not term:
             return
-        rows = self.db.query("SELECT id, name, sale_price FROM products WHERE name LIKE ? OR CAST(id AS TEXT) LIKE ? ORDER BY name LIMIT 50;", (f"%{term}%", f"%{term}%"))
-        for r in rows:
-            self.suggestions.insert('end', f"{r['id']} - {r['name']} - {r['sale_price']}")
+        for pid, name, price in product_search_cached(term):
+            self.suggestions.insert('end', f"{pid} - {name} - {price}")
 
     def _on_suggestion_double(self, event=None):
         sel = self.suggestions.curselection()
@@ -563,7 +834,7 @@ class NewSaleTab(ttk.Frame):
             return
         val = self.suggestions.get(sel[0])
         pid = int(val.split(' - ')[0])
-        row = self.db.query("SELECT * FROM products WHERE id=?;", (pid,))
+        row = self.db.query("SELECT id, name, sale_price FROM products WHERE id=?;", (pid,))
         if row:
             self.selected_product = row[0]
             self.search_e.delete(0, 'end')
@@ -577,10 +848,10 @@ class NewSaleTab(ttk.Frame):
             qty = 0
         prod = None
         if term.isdigit():
-            rows = self.db.query("SELECT * FROM products WHERE id=?;", (int(term),))
+            rows = self.db.query("SELECT id, name, sale_price FROM products WHERE id=?;", (int(term),))
             if rows: prod = rows[0]
         if not prod:
-            rows = self.db.query("SELECT * FROM products WHERE name=? LIMIT 1;", (term,))
+            rows = self.db.query("SELECT id, name, sale_price FROM products WHERE name=? LIMIT 1;", (term,))
             if rows: prod = rows[0]
         if not prod:
             messagebox.showwarning("Not found", "Product not found. Use search box and double-click a suggestion.")
@@ -588,7 +859,22 @@ class NewSaleTab(ttk.Frame):
         if qty <= 0:
             messagebox.showwarning("Invalid qty", "Enter quantity > 0")
             return
-        self.cart.append({'id': prod['id'], 'name': prod['name'], 'qty': qty, 'price': prod['sale_price'], 'subtotal': prod['sale_price']*qty})
+        existing = self._cart_index.get(prod['id'])
+        if existing:
+            # same product again: merge into the existing line in place
+            existing['qty'] += qty
+            existing['subtotal'] = existing['price'] * existing['qty']
+            self.tree.item(existing['iid'], values=[
+                existing['name'], existing['qty'], existing['price'], existing['subtotal']])
+            self._running_total += existing['price'] * qty
+            self.search_e.delete(0, 'end'); self.qty_e.delete(0, 'end'); self.refresh()
+            return
+        item = {'id': prod['id'], 'name': prod['name'], 'qty': qty, 'price': prod['sale_price'], 'subtotal': prod['sale_price']*qty}
+        # incremental tree update: one insert per added line, never a rebuild
+        item['iid'] = self.tree.insert('', 'end', values=[item['name'], item['qty'], item['price'], item['subtotal']])
+        self.cart.append(item)
+        self._cart_index[item['id']] = item
+        self._running_total += item['subtotal']
         self.search_e.delete(0, 'end'); self.qty_e.delete(0, 'end'); self.refresh()
 
     def remove_selected(self):
@@ -596,17 +882,23 @@ class NewSaleTab(ttk.Frame):
         if not sel:
             return
         idx = self.tree.index(sel[0])
-        del self.cart[idx]
+        item = self.cart.pop(idx)
+        self._cart_index.pop(item['id'], None)
+        self.tree.delete(item['iid'])
+        self._running_total -= item['subtotal']
         self.refresh()
 
-    def refresh(self):
+    def clear_cart(self):
+        self.cart.clear()
+        self._cart_index.clear()
         self.tree.delete(*self.tree.get_children())
-        total = 0
-        for item in self.cart:
-            self.tree.insert('', 'end', values=[item['name'], item['qty'], item['price'], item['subtotal']])
-            total += item['subtotal']
-        self.lbl_total.config(text=f"Total: {total:.2f}")
-        
+        self._running_total = 0.0
+        self.refresh()
+
+    def refresh(self):
+        # rows are maintained incrementally; only the total label changes here
+        self.lbl_total.config(text=f"Total: {self._running_total:.2f}")
+
     def checkout(self):
         if not self.cart:
             messagebox.showwarning("Empty", "Cart is empty")
@@ -614,32 +906,57 @@ class NewSaleTab(ttk.Frame):
 
         cust_name = self.customer_name_e.get().strip()
         cust_phone = self.customer_phone_e.get().strip()
-        total = sum(i['subtotal'] for i in self.cart)
+        # the running total is maintained incrementally on add/remove, so even
+        # thousand-line invoices don't re-sum the cart here
+        total = self._running_total
 
         created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        sid = self.db.execute(
-            "INSERT INTO sales(user_id,total,customer_name,customer_phone,created_at) VALUES(?,?,?,?,?);",
-            (self.user['id'], total, cust_name, cust_phone, created_at)
-        )
+        # One transaction for the whole sale: a 10-line cart used to pay
+        # ~30 connect/commit cycles (one per statement); now it pays one.
+        shortages = []
+        with self.db.transaction() as cur:
+            cur.execute(
+                "INSERT INTO sales(user_id,total,customer_name,customer_phone,created_at) VALUES(?,?,?,?,?);",
+                (self.user['id'], total, cust_name, cust_phone, created_at)
+            )
+            sid = cur.lastrowid
 
-        for i in self.cart:
-            sale_item_id = self.db.execute(
+            # all line items go in with one executemany; their ids come back
+            # in insert order (autoincrement) for the per-product FIFO pass
+            cur.executemany(
                 "INSERT INTO sale_items(sale_id,product_id,quantity,price) VALUES(?,?,?,?);",
-                (sid, i['id'], i['qty'], i['price'])
+                [(sid, i['id'], i['qty'], i['price']) for i in self.cart]
             )
-            self._fifo_deduct_with_batch_tracking(i['id'], i['qty'], sale_item_id, i['name'])
+            cur.execute("SELECT id FROM sale_items WHERE sale_id=? ORDER BY id;", (sid,))
+            item_ids = [r[0] for r in cur.fetchall()]
+            for sale_item_id, i in zip(item_ids, self.cart):
+                short = self._fifo_deduct_with_batch_tracking(i['id'], i['qty'], sale_item_id, i['name'], cur)
+                if short:
+                    shortages.append(short)
+
+        for pname, remain in shortages:
+            messagebox.showwarning("Stock Warning", f"Product {pname} had insufficient stock. Short by {remain}.")
+
+        # 🚀 Auto save + open in Microsoft Edge — off the Tk thread so the
+        # checkout UI comes back immediately even for long receipts
+        _IO_POOL.submit(self._gen_and_open, sid, total, cust_name, cust_phone)
+
+        # a sale changes batch quantities, so refresh just the stock-bearing
+        # inventory trees rather than all seven tabs
+        if getattr(self, 'app', None):
+            self.app._inv_refresh_only('med', 'nonmed', 'batch')
+
+        messagebox.showinfo("Sale Complete", f"Sale #{sid} completed.")
+        self.clear_cart()
 
-        # 🚀 Auto save + open in Microsoft Edge
-        filepath = self.generate_receipt(sid, total, cust_name, cust_phone, preview_only=True)
+    def _gen_and_open(self, sale_id, total, cust_name, cust_phone):
         try:
+            filepath = self.generate_receipt(sale_id, total, cust_name, cust_phone, preview_only=True)
             os.startfile(filepath)  # opens with default PDF viewer (Edge, if set as default)
         except Exception as e:
-            messagebox.showerror("Open Error", f"Could not open receipt:\n{e}")
-
-        messagebox.showinfo("Sale Complete", f"Sale #{sid} completed.")
-        self.cart.clear()
-        self.refresh()
+            err = str(e)
+            self.after(0, lambda: messagebox.showerror("Open Error", f"Could not open receipt:\n{err}"))
 
 
 
@@ -704,31 +1021,25 @@ class NewSaleTab(ttk.Frame):
     #     self.refresh_cart()
 
 
-    def _fifo_deduct_with_batch_tracking(self, product_id, qty_needed, sale_item_id, pname):
-        batches = self.db.query(
-            "SELECT id, quantity FROM batches WHERE product_id=? AND quantity>0 ORDER BY created_at ASC;", 
-            (product_id,)
+    def _fifo_deduct_with_batch_tracking(self, product_id, qty_needed, sale_item_id, pname, cur):
+        """Deduct stock FIFO on the caller's cursor. Returns (pname, shortage) or None."""
+        # One window-function query computes each batch's take instead of a
+        # Python loop over per-batch SELECTs: 'prior' is the stock consumed by
+        # earlier (FIFO-ordered) batches, so take = min(quantity, needed - prior).
+        cur.execute(SQL_FIFO_TAKES, (product_id, qty_needed, qty_needed))
+        takes = [(r['id'], r['take']) for r in cur.fetchall()]
+
+        cur.executemany("UPDATE batches SET quantity=quantity-? WHERE id=?;",
+                        [(take, bid) for bid, take in takes])
+        cur.executemany(
+            "INSERT INTO sale_item_batches(sale_item_id, batch_id, quantity) VALUES(?,?,?);",
+            [(sale_item_id, bid, take) for bid, take in takes]
         )
-        remain = qty_needed
-        
-        for b in batches:
-            if remain <= 0:
-                break
-            take = min(remain, b['quantity'])
-            
-            # Update batch quantity
-            self.db.execute("UPDATE batches SET quantity=quantity-? WHERE id=?;", (take, b['id']))
-            
-            # Create sale_item_batches entry
-            self.db.execute(
-                "INSERT INTO sale_item_batches(sale_item_id, batch_id, quantity) VALUES(?,?,?);",
-                (sale_item_id, b['id'], take)
-            )
-            
-            remain -= take
-        
+
+        remain = qty_needed - sum(take for _, take in takes)
         if remain > 0:
-            messagebox.showwarning("Stock Warning", f"Product {pname} had insufficient stock. Short by {remain}.")
+            return (pname, remain)
+        return None
     
 
    
@@ -838,20 +1149,13 @@ class NewSaleTab(ttk.Frame):
     #     return filepath
 
     def generate_receipt(self, sale_id, total, cust_name, cust_phone, direct_print=False, preview_only=False):
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.units import mm
 
-        settings = {r['key']: r['value'] for r in self.db.query("SELECT key,value FROM settings;")}
+        settings = self.db.settings
         pharmacy_name = settings.get('pharmacy_name', 'Pharmacy Receipt')
         pharmacy_address = settings.get('pharmacy_address', '')
         pharmacy_phone = settings.get('pharmacy_phone', '')
 
-        items = self.db.query("""
-            SELECT si.quantity, si.price, p.name 
-            FROM sale_items si 
-            JOIN products p ON si.product_id=p.id 
-            WHERE si.sale_id=?;
-        """, (sale_id,))
+        items = self.db.query(SQL_SALE_ITEMS, (sale_id,), raw=True)
 
         # Dynamic receipt height
         line_height = 12
@@ -860,11 +1164,11 @@ class NewSaleTab(ttk.Frame):
         receipt_height = header_height + footer_height + (len(items) * line_height)
         receipt_width = 80 * mm
 
-        folder = os.path.join(os.path.dirname(__file__), "receipts")
-        os.makedirs(folder, exist_ok=True)
-        filepath = os.path.join(folder, f"receipt_{sale_id}.pdf")
+        filepath = os.path.join(RECEIPT_FOLDER, f"receipt_{sale_id}.pdf")
 
-        c = canvas.Canvas(filepath, pagesize=(receipt_width, receipt_height))
+        # Render into memory, then flush to disk in a single large write
+        buf = io.BytesIO()
+        c = pdf_canvas.Canvas(buf, pagesize=(receipt_width, receipt_height))
         width, height = receipt_width, receipt_height
         y = height - 10
 
@@ -880,7 +1184,6 @@ class NewSaleTab(ttk.Frame):
         c.line(2, y, width-2, y); y -= 12
 
         # ===== Sale Info =====
-        from datetime import datetime
         c.setFont("Helvetica", 8)
         c.drawString(2, y, f"Sale ID: {sale_id}")
         c.drawRightString(width-2, y, datetime.now().strftime("%Y-%m-%d %H:%M")); y -= 10
@@ -901,11 +1204,11 @@ class NewSaleTab(ttk.Frame):
 
         # ===== Items =====
         c.setFont("Helvetica", 8)
-        for it in items:
-            c.drawString(2, y, str(it['name'])[:15])  # truncate long names
-            c.drawRightString(width-40, y, str(it['quantity']))
-            c.drawRightString(width-20, y, f"{it['price']:.2f}")
-            c.drawRightString(width-2, y, f"{it['price']*it['quantity']:.2f}")
+        for quantity, price, subtotal, name in items:
+            c.drawString(2, y, str(name)[:15])  # truncate long names
+            c.drawRightString(width-40, y, str(quantity))
+            c.drawRightString(width-20, y, f"{price:.2f}")
+            c.drawRightString(width-2, y, f"{subtotal:.2f}")
             y -= line_height
 
         c.line(2, y, width-2, y); y -= 14
@@ -922,15 +1225,16 @@ class NewSaleTab(ttk.Frame):
         c.drawCentredString(width/2, y, "Medicines once sold are not returnable.")
 
         c.save()
+        with open(filepath, 'wb', buffering=512*1024) as f:
+            f.write(buf.getvalue())
 
         if preview_only:
             return filepath
 
         if direct_print:
             try:
-                import win32print, win32api
-                printer_name = win32print.GetDefaultPrinter()
-                win32api.ShellExecute(0, "print", filepath, f'"{printer_name}"', ".", 0)
+                # detached OS print verb: no win32api import, no PDF reader spawn
+                spawn_print(filepath)
             except Exception as e:
                 messagebox.showwarning("Print Error", f"Could not print directly:\n{e}")
         else:
@@ -952,6 +1256,7 @@ class App:
         self.root.geometry('1200x780')
         self.root.protocol('WM_DELETE_WINDOW', self._on_close)
         self.root.iconbitmap("icon.ico")
+        _init_styles()
 
         self.db = db
         self.user = None
@@ -964,6 +1269,15 @@ class App:
                 self.root.after_cancel(self._auto_job)
         except Exception:
             pass
+        try:
+            _IO_POOL.shutdown(wait=False, cancel_futures=True)
+            _DB_POOL.shutdown(wait=False, cancel_futures=True)
+        except Exception:
+            pass
+        try:
+            self.db.close_all()
+        except Exception:
+            pass
         self.root.quit()
         self.root.destroy()
 
@@ -994,93 +1308,93 @@ class App:
     # put these methods in App class (or another central class that both
 # NewSaleTab.checkout and App._print_receipt can call)
 
-    def _format_receipt_text(self, sale_id, total, cust_name, cust_phone, width=40):
+    def _format_receipt_text(self, sale_id, total, cust_name, cust_phone, width=40,
+                             items=None, settings=None):
         """
         Build a monospaced text receipt. width = number of characters per line.
         Returns bytes encoded for the printer (cp850 is common for thermal printers).
+        Pass items/settings when the caller already has them to skip the queries.
         """
-        # load settings and items
-        settings = {r['key']: r['value'] for r in self.db.query("SELECT key,value FROM settings;")}
+        # load settings and items (reuse caller's copies when provided)
+        if settings is None:
+            settings = self.db.settings
         pharmacy_name = settings.get('pharmacy_name', 'Pharmacy')
         address = settings.get('pharmacy_address', '')
         phone = settings.get('pharmacy_phone', '')
 
-        items = self.db.query(
-            "SELECT si.quantity, si.price, p.name "
-            "FROM sale_items si JOIN products p ON si.product_id=p.id WHERE si.sale_id=?;",
-            (sale_id,)
-        )
+        if items is None:
+            items = self.db.query(SQL_SALE_ITEMS, (sale_id,), raw=True)
 
-        def center(s):
-            s = s.strip()
-            if len(s) >= width:
-                return s[:width]
-            left = (width - len(s)) // 2
-            return " " * left + s
-
-        def right(s, w):
-            s = str(s)
-            if len(s) >= w:
-                return s[-w:]
-            return " " * (w - len(s)) + s
+        # Build the printer payload as bytes directly: each text field is
+        # encoded to cp850 once, padding/joins then stay in C bytes ops
+        # (prices/quantities are ASCII via bytes %-formatting, free).
+        def enc(s):
+            return str(s).encode('cp850', 'replace')
+
+        # static blocks (separator, column header, footer) are identical for
+        # a given width; encode them once per process
+        rule, col_header, footer = _receipt_static_bytes(width)
 
         lines = []
-        lines.append(center(pharmacy_name))
+
+        def center(s):
+            b = enc(s.strip())
+            if len(b) >= width:
+                lines.append(b[:width])
+            else:
+                lines.append(b" " * ((width - len(b)) // 2) + b)
+
+        center(pharmacy_name)
         if address:
-            lines.append(center(address))
+            center(address)
         if phone:
-            lines.append(center("Tel: " + phone))
-        lines.append("-" * width)
-        lines.append(f"Sale ID: {sale_id}")
+            center("Tel: " + phone)
+        lines.append(rule)
+        lines.append(b"Sale ID: %d" % int(sale_id))
         if cust_name:
-            lines.append(f"Customer: {cust_name}")
+            lines.append(b"Customer: " + enc(cust_name))
         if cust_phone:
-            lines.append(f"Phone: {cust_phone}")
+            lines.append(b"Phone: " + enc(cust_phone))
         # date/time
-        from datetime import datetime
-        lines.append(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append("-" * width)
+        lines.append(b"Date: " + datetime.now().strftime('%Y-%m-%d %H:%M:%S').encode('ascii'))
+        lines.append(rule)
 
-        # Header for items - choose columns sizes
-        # Example layout (width 40):
-        # Item (20 chars) | QTY (3) | Price (7) | Subtotal (8) = 20+3+7+8 = 38 + spaces
+        # Column sizes match the cached header (see _receipt_static_bytes)
         name_w = 20
         qty_w = 3
         price_w = 7
         sub_w = width - name_w - qty_w - price_w - 3  # -3 for spacing
-        header = f"{'Item'.ljust(name_w)} {'Qty'.rjust(qty_w)} {'Price'.rjust(price_w)} {'Total'.rjust(sub_w)}"
-        lines.append(header)
-        lines.append("-" * width)
-
-        for it in items:
-            name = str(it['name'])[:name_w]
-            qty = str(it['quantity'])
-            price = f"{it['price']:.2f}"
-            subtotal = f"{(it['price'] * it['quantity']):.2f}"
-            line = f"{name.ljust(name_w)} {qty.rjust(qty_w)} {price.rjust(price_w)} {subtotal.rjust(sub_w)}"
-            lines.append(line)
-
-        lines.append("-" * width)
-        tot_line = f"{'TOTAL'.ljust(width - 10)}{format(total, '.2f').rjust(10)}"
-        lines.append(tot_line)
-        lines.append("")
-        lines.append(center("Thank you for shopping!"))
-        lines.append(center("Get well soon!"))
-        lines.append("\n\n")  # some feed for cutter
-
-        out_text = "\r\n".join(lines)
-        # use cp850 or cp437 to support common thermal printers; fallback to utf-8 if needed
-        try:
-            out_bytes = out_text.encode('cp850')
-        except Exception:
-            out_bytes = out_text.encode('utf-8', 'replace')
-        return out_bytes
+        lines.append(col_header)
+        lines.append(rule)
+
+        for quantity, price, subtotal, name in items:
+            lines.append(b"%s %s %s %s" % (
+                enc(str(name)[:name_w]).ljust(name_w),
+                (b"%d" % quantity).rjust(qty_w),
+                (b"%.2f" % price).rjust(price_w),
+                (b"%.2f" % subtotal).rjust(sub_w),
+            ))
+
+        lines.append(rule)
+        lines.append(b"TOTAL".ljust(width - 10) + (b"%.2f" % total).rjust(10))
+        lines.append(footer)
+
+        return b"\r\n".join(lines)
 
 
     def _send_bytes_to_printer(self, raw_bytes):
         """
         Send raw bytes to the default Windows printer using win32print.
         """
+        self._send_batch_to_printer([raw_bytes])
+
+    def _send_batch_to_printer(self, blobs, flush_at=64 * 1024):
+        """
+        Spool many receipt blobs as one RAW job: the printer is opened once
+        and bytes are accumulated into a buffer that is only handed to
+        WritePrinter when it exceeds flush_at (or at job end), so batch
+        reprints don't pay a spooler call per tiny receipt.
+        """
         try:
             import win32print
         except Exception as e:
@@ -1092,14 +1406,23 @@ class App:
         if not printer_name:
             raise RuntimeError("No default printer found.")
 
+        buf = bytearray()
         hPrinter = win32print.OpenPrinter(printer_name)
         try:
             # Start a RAW print job
             hJob = win32print.StartDocPrinter(hPrinter, 1, ("Receipt", None, "RAW"))
             win32print.StartPagePrinter(hPrinter)
-            win32print.WritePrinter(hPrinter, raw_bytes)
-            win32print.EndPagePrinter(hPrinter)
-            win32print.EndDocPrinter(hPrinter)
+            try:
+                for blob in blobs:
+                    buf += blob
+                    if len(buf) >= flush_at:
+                        win32print.WritePrinter(hPrinter, bytes(buf))
+                        buf.clear()
+                if buf:
+                    win32print.WritePrinter(hPrinter, bytes(buf))
+            finally:
+                win32print.EndPagePrinter(hPrinter)
+                win32print.EndDocPrinter(hPrinter)
         finally:
             win32print.ClosePrinter(hPrinter)
 
@@ -1110,15 +1433,18 @@ class App:
         If a default printer exists, send raw text to it.
         Otherwise, open PDF in Edge.
         """
-        # 1) Always save the PDF (history record)
-        filepath = self.generate_receipt(sale_id, total, cust_name, cust_phone, preview_only=True)
+        # 1) Always save the PDF (history record); keep the items/settings it
+        #    already fetched so the raw-text path does not hit the DB again
+        filepath, items, settings = self.generate_receipt(
+            sale_id, total, cust_name, cust_phone, preview_only=True)
 
         # 2) Try direct print
         try:
             import win32print
             printer_name = win32print.GetDefaultPrinter()
             if printer_name:
-                raw = self._format_receipt_text(sale_id, total, cust_name, cust_phone)
+                raw = self._format_receipt_text(sale_id, total, cust_name, cust_phone,
+                                                items=items, settings=settings)
                 self._send_bytes_to_printer(raw)
                 return filepath
             else:
@@ -1128,48 +1454,163 @@ class App:
             try:
                 os.startfile(filepath)  # This will open in default PDF viewer (Edge usually)
             except Exception as e:
-                from tkinter import messagebox
-                messagebox.showerror("Open Error", f"Could not open receipt PDF:\n{e}")
+                # may run on a worker thread; hop to the Tk thread for the dialog
+                err = str(e)
+                self.root.after(0, lambda: messagebox.showerror(
+                    "Open Error", f"Could not open receipt PDF:\n{err}"))
 
         return filepath
 
 
         
-    def generate_receipt(self, sale_id, total, cust_name="", cust_phone="", preview_only=False, direct_print=False):
-        from reportlab.pdfgen import canvas as pdf_canvas
-        from reportlab.lib.pagesizes import A4
+    def _emit_pdf_receipt(self, filepath, ops, height, width=226):
+        """Write a single-page text-only PDF without reportlab.
+
+        ops is a list of (font, size, x, y, text) tuples where font is
+        'Courier' or 'Courier-Bold' (base-14 fonts: nothing to embed, no
+        AFM parsing). Enough for an 80mm thermal receipt; used as the
+        fast fallback when reportlab is not installed.
+        """
+        def esc(s):
+            return s.replace('\\', r'\\').replace('(', r'\(').replace(')', r'\)')
+
+        content = ["BT"]
+        cur = (None, None)
+        for font, size, x, y, text in ops:
+            fid = "/F2" if font == "Courier-Bold" else "/F1"
+            if (fid, size) != cur:
+                content.append(f"{fid} {size} Tf")
+                cur = (fid, size)
+            content.append(f"1 0 0 1 {x:.1f} {y:.1f} Tm ({esc(str(text))}) Tj")
+        content.append("ET")
+        stream = "\n".join(content).encode('latin-1', 'replace')
+
+        objs = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {int(height)}] "
+             "/Resources << /Font << /F1 5 0 R /F2 6 0 R >> >> /Contents 4 0 R >>").encode('latin-1'),
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream),
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier >>",
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold >>",
+        ]
+        out = io.BytesIO()
+        out.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, body in enumerate(objs, start=1):
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n%s\nendobj\n" % (i, body))
+        xref_at = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1))
+        for off in offsets:
+            out.write(b"%010d 00000 n \n" % off)
+        out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                  % (len(objs) + 1, xref_at))
+        with open(filepath, 'wb', buffering=65536) as f:
+            f.write(out.getvalue())
+        return filepath
+
+    def _fetch_items_for_sales(self, sale_ids):
+        """Fetch line items for several sales in one query (avoids N+1).
+
+        Returns {sale_id: [rows]} so batch drivers (e.g. reprinting a day's
+        receipts) can pass each list to generate_receipt via items=.
+        """
+        sale_ids = list(sale_ids)
+        if not sale_ids:
+            return {}
+        placeholders = ",".join("?" * len(sale_ids))
+        rows = self.db.query(
+            "SELECT si.sale_id, si.quantity, si.price, (si.quantity*si.price) AS subtotal, p.name "
+            "FROM sale_items si "
+            f"JOIN products p ON si.product_id=p.id WHERE si.sale_id IN ({placeholders}) "
+            "ORDER BY si.sale_id;",
+            tuple(sale_ids),
+            raw=True
+        )
+        # strip the leading sale_id so each row matches SQL_SALE_ITEMS' shape
+        return {sid: [r[1:] for r in grp]
+                for sid, grp in itertools.groupby(rows, key=lambda r: r[0])}
 
+    def generate_receipt(self, sale_id, total, cust_name="", cust_phone="", preview_only=False, direct_print=False, items=None):
         # Thermal-style width (~3 inch)
         RECEIPT_WIDTH = 250
         RECEIPT_HEIGHT = 600
 
-        # Query sale + items
-        items = self.db.query(
-            "SELECT si.quantity, si.price, p.name FROM sale_items si "
-            "JOIN products p ON si.product_id=p.id WHERE si.sale_id=?;",
-            (sale_id,)
-        )
-        sale = self.db.query("SELECT * FROM sales WHERE id=?;", (sale_id,))
+        # Query sale + items (skipped when a batch driver pre-fetched them)
+        if items is None:
+            items = self.db.query(SQL_SALE_ITEMS, (sale_id,), raw=True)
+        sale = self.db.query_one(
+            "SELECT created_at FROM sales WHERE id=? LIMIT 1;", (sale_id,))
         if not sale:
-            return None
-        sale = sale[0]
+            return None, [], self.db.settings
 
         # Save folder
-        folder = os.path.join(os.path.dirname(__file__), "receipts")
-        os.makedirs(folder, exist_ok=True)
-        filepath = os.path.join(folder, f"receipt_{sale_id}.pdf")
-
-        # Create PDF canvas
-        c = pdf_canvas.Canvas(filepath, pagesize=(RECEIPT_WIDTH, RECEIPT_HEIGHT))
+        filepath = os.path.join(RECEIPT_FOLDER, f"receipt_{sale_id}.pdf")
+
+        # the hand-rolled emitter is also the fast path for typical receipts:
+        # no canvas state machine or font metrics, one write. reportlab only
+        # handles the receipts long enough to need page breaks.
+        if not REPORTLAB_AVAILABLE or len(items) <= 30:
+            # minimal hand-rolled emitter keeps receipts working (and fast)
+            # without reportlab; Courier is monospaced so alignment is just
+            # 0.6 * size per character
+            def r_x(edge, size, text):
+                return edge - 0.6 * size * len(str(text))
+
+            def c_x(size, text):
+                return (RECEIPT_WIDTH - 0.6 * size * len(str(text))) / 2
+
+            ops = []
+            y = RECEIPT_HEIGHT - 30
+            title = self.db.settings.get('pharmacy_name', 'Pharmacy Receipt')
+            ops.append(("Courier-Bold", 12, c_x(12, title), y, title)); y -= 20
+            ops.append(("Courier", 8, 5, y, f"Sale ID: {sale_id}")); y -= 12
+            if cust_name:
+                ops.append(("Courier", 8, 5, y, f"Customer: {cust_name[:20]}")); y -= 12
+            if cust_phone:
+                ops.append(("Courier", 8, 5, y, f"Phone: {cust_phone}")); y -= 12
+            ops.append(("Courier", 8, 5, y, f"Date: {sale['created_at']}")); y -= 16
+            ops.append(("Courier-Bold", 8, 5, y, "Item"))
+            ops.append(("Courier-Bold", 8, 120, y, "Qty"))
+            ops.append(("Courier-Bold", 8, 170, y, "Price"))
+            ops.append(("Courier-Bold", 8, 220, y, "Total")); y -= 14
+            for quantity, price, subtotal, name in items:
+                sub = f"{subtotal:.2f}"
+                ops.append(("Courier", 8, 5, y, str(name)[:15]))
+                ops.append(("Courier", 8, r_x(140, 8, quantity), y, quantity))
+                ops.append(("Courier", 8, r_x(190, 8, f"{price:.2f}"), y, f"{price:.2f}"))
+                ops.append(("Courier", 8, r_x(RECEIPT_WIDTH - 10, 8, sub), y, sub))
+                y -= 12
+            y -= 15
+            tot = f"TOTAL: {total:.2f}"
+            ops.append(("Courier-Bold", 10, r_x(RECEIPT_WIDTH - 10, 10, tot), y, tot)); y -= 20
+            msg = "Thank you for shopping!"
+            ops.append(("Courier", 8, c_x(8, msg), y, msg))
+            self._emit_pdf_receipt(filepath, ops, RECEIPT_HEIGHT, width=RECEIPT_WIDTH)
+            return filepath, items, self.db.settings
+
+        # Create PDF canvas (in memory; written to disk in one shot below)
+        buf = io.BytesIO()
+        c = pdf_canvas.Canvas(buf, pagesize=(RECEIPT_WIDTH, RECEIPT_HEIGHT))
         width, height = RECEIPT_WIDTH, RECEIPT_HEIGHT
         y = height - 30
 
         # Header
         c.setFont("Courier-Bold", 12)
-        c.drawCentredString(width/2, y, "Pharmacy Receipt")
+        c.drawCentredString(width/2, y, self.db.settings.get('pharmacy_name', 'Pharmacy Receipt'))
         y -= 20
 
-        c.setFont("Courier", 8)
+        # skip redundant setFont calls: reportlab re-emits the Tf operator
+        # (and touches font state) even when the font hasn't changed
+        _font = ["Courier-Bold", 12]
+
+        def set_font(name, size):
+            if [name, size] != _font:
+                c.setFont(name, size)
+                _font[0], _font[1] = name, size
+
+        set_font("Courier", 8)
         c.drawString(5, y, f"Sale ID: {sale_id}")
         y -= 12
         if cust_name:
@@ -1182,22 +1623,22 @@ class App:
         y -= 16
 
         # Column headers
-        c.setFont("Courier-Bold", 8)
+        set_font("Courier-Bold", 8)
         c.drawString(5, y, "Item")
         c.drawString(120, y, "Qty")
         c.drawString(170, y, "Price")
         c.drawString(220, y, "Total")
         y -= 12
-        c.setFont("Courier", 8)
+        set_font("Courier", 8)
         c.line(5, y+5, width-5, y+5)
         y -= 10
 
         # Items
-        for it in items:
-            name = str(it['name'])[:15]  # truncate name
-            qty = str(it['quantity'])
-            price = f"{it['price']:.2f}"
-            subtotal = f"{it['price']*it['quantity']:.2f}"
+        for quantity, price, subtotal, name in items:
+            name = str(name)[:15]  # truncate name
+            qty = str(quantity)
+            price = f"{price:.2f}"
+            subtotal = f"{subtotal:.2f}"
 
             c.drawString(5, y, name)
             c.drawRightString(140, y, qty)
@@ -1208,18 +1649,21 @@ class App:
             if y < 50:
                 c.showPage()
                 y = height - 30
-                c.setFont("Courier", 8)
+                _font[0] = None  # showPage resets page font state
+                set_font("Courier", 8)
 
         # Footer
         c.line(5, y, width-5, y)
         y -= 15
-        c.setFont("Courier-Bold", 10)
+        set_font("Courier-Bold", 10)
         c.drawRightString(width-10, y, f"TOTAL: {total:.2f}")
         y -= 20
-        c.setFont("Courier", 8)
+        set_font("Courier", 8)
         c.drawCentredString(width/2, y, "Thank you for shopping!")
 
         c.save()
+        with open(filepath, 'wb', buffering=512*1024) as f:
+            f.write(buf.getvalue())
 
         # Print directly if requested
         if direct_print:
@@ -1229,272 +1673,16 @@ class App:
                 from tkinter import messagebox
                 messagebox.showerror("Print Error", f"Could not print receipt:\n{e}")
 
-        return filepath
-
-
-    
-    def _build_main(self):
-        # Clear window
-        for w in self.root.winfo_children():
-            w.destroy()
-
-        # Main container
-        container = ttk.Frame(self.root)
-        container.pack(fill="both", expand=True)
-        container.grid_rowconfigure(0, weight=1)
-        container.grid_columnconfigure(1, weight=1)  # main area expands
-
-        # ---------------- SIDEBAR ----------------
-        self.sidebar_expanded = True
-        self.sidebar_width = 220
-
-        sidebar = tk.Frame(container, bg="#2c3e50", width=self.sidebar_width)
-        sidebar.grid(row=0, column=0, sticky="ns")
-        sidebar.grid_propagate(False)
-        sidebar.grid_rowconfigure(1, weight=1)  # push profile/logout to bottom
-
-        # Sidebar Header
-        header_frame = tk.Frame(sidebar, bg="#2c3e50")
-        header_frame.grid(row=0, column=0, sticky="ew")
-
-        self.brand_lbl = tk.Label(
-            header_frame,
-            text="🏥 Pharmacy",
-            font=("Segoe UI", 15, "bold"),
-            bg="#2c3e50",
-            fg="white",
-            pady=15
-        )
-        self.brand_lbl.pack(side="left", padx=10)
-
-        toggle_btn = tk.Label(
-            header_frame,
-            text="☰",
-            font=("Segoe UI", 14, "bold"),
-            bg="#2c3e50",
-            fg="white",
-            cursor="hand2"
-        )
-        toggle_btn.pack(side="right", padx=10)
-
-        # ---------------- NAVIGATION AREA ----------------
-        nav_frame = tk.Frame(sidebar, bg="#2c3e50")
-        nav_frame.grid(row=1, column=0, sticky="nsew")
-        nav_items, nav_texts = [], []
-
-        def add_nav_button(text, command, icon="📊"):
-            full_text = f"{icon} {text}"
-            btn = tk.Label(
-                nav_frame,
-                text=full_text,
-                font=("Segoe UI", 11, "bold"),
-                bg="#2c3e50",
-                fg="white",
-                anchor="w",
-                padx=20,
-                pady=12,
-                cursor="hand2"
-            )
-            btn.pack(fill="x")
-
-            def on_enter(e): btn.config(bg="#34495e")
-            def on_leave(e):
-                if btn not in active_btn:
-                    btn.config(bg="#2c3e50")
-            btn.bind("<Enter>", on_enter)
-            btn.bind("<Leave>", on_leave)
-            btn.bind("<Button-1>", lambda e: command())
-
-            nav_items.append(btn)
-            nav_texts.append(full_text)
-            return btn
-
-        # ---------------- PROFILE + LOGOUT ----------------
-        bottom_frame = tk.Frame(sidebar, bg="#2c3e50")
-        bottom_frame.grid(row=2, column=0, sticky="ew")
-
-        # User Info
-        self.user_lbl = tk.Label(
-            bottom_frame,
-            text=f"👤 {self.user['username'].title()} ({self.user['role']})",
-            font=("Segoe UI", 10, "bold"),
-            bg="#2c3e50",
-            fg="white",
-            anchor="w",
-            padx=15,
-            pady=10
-        )
-        self.user_lbl.pack(fill="x")
-
-        # Logout button
-        logout_btn = tk.Label(
-            bottom_frame,
-            text="🚪 Logout",
-            font=("Segoe UI", 11, "bold"),
-            bg="#2c3e50",
-            fg="white",
-            anchor="w",
-            padx=20,
-            pady=12,
-            cursor="hand2"
-        )
-        logout_btn.pack(fill="x")
-
-        def on_logout_enter(e): logout_btn.config(bg="#e74c3c")
-        def on_logout_leave(e): logout_btn.config(bg="#2c3e50")
-        logout_btn.bind("<Enter>", on_logout_enter)
-        logout_btn.bind("<Leave>", on_logout_leave)
-        logout_btn.bind("<Button-1>", lambda e: self._logout())
-
-        # ---------------- TOGGLE SIDEBAR ----------------
-        def toggle_sidebar(event=None):
-            if self.sidebar_expanded:
-                # Collapse
-                self.sidebar_width = 60
-                sidebar.config(width=self.sidebar_width)
-                self.brand_lbl.config(text="🏥")
-                self.user_lbl.config(text="👤")  # only icon
-                logout_btn.config(text="🚪")
-                for b in nav_items:
-                    icon = b.cget("text").split(" ")[0]
-                    b.config(text=icon)
-            else:
-                # Expand
-                self.sidebar_width = 220
-                sidebar.config(width=self.sidebar_width)
-                self.brand_lbl.config(text="🏥 Pharmacy")
-                self.user_lbl.config(text=f"👤 {self.user['username'].title()} ({self.user['role']})")
-                logout_btn.config(text="🚪 Logout")
-                for b, full_text in zip(nav_items, nav_texts):
-                    b.config(text=full_text)
-            self.sidebar_expanded = not self.sidebar_expanded
-
-        toggle_btn.bind("<Button-1>", toggle_sidebar)
-
-        # ---------------- MAIN CONTENT ----------------
-        self.main_area = ttk.Frame(container)
-        self.main_area.grid(row=0, column=1, sticky="nsew")
-
-        # Content switcher
-        def clear_main():
-            for w in self.main_area.winfo_children():
-                w.destroy()
-
-        def show_dashboard():
-            clear_main()
-            self._build_dashboard_tab()
-
-        def show_inventory():
-            clear_main()
-            self._build_inventory_tab()
-
-        def show_pos():
-            clear_main()
-            self._build_pos_tab()
+        return filepath, items, self.db.settings
 
-        def show_staff():
-            clear_main()
-            self._build_manage_staff_tab()
-
-        def show_settings():
-            clear_main()
-            self._build_settings_tab()
 
-        # Navigation buttons
-   # Navigation buttons with PNG icons
-        btn_dashboard = add_nav_button("Dashboard", show_dashboard, self.icon_dashboard)
-        btn_inventory = add_nav_button("Inventory", show_inventory, self.icon_inventory)
-        btn_pos = add_nav_button("POS", show_pos, self.icon_pos)
-
-        if self.user["role"] == "admin":
-            btn_staff = add_nav_button("Staff", show_staff, self.icon_staff)
-            btn_settings = add_nav_button("Settings", show_settings, self.icon_settings)
-
-
-        # Active highlight
-        active_btn = []
-
-        def activate(btn):
-            for b in nav_items:
-                b.config(bg="#2c3e50")
-            btn.config(bg="#1abc9c")
-            active_btn.clear()
-            active_btn.append(btn)
-
-        for btn in nav_items:
-            btn.bind("<Button-1>", lambda e, b=btn: (activate(b), b.event_generate("<<CustomClick>>")))
-
-        btn_dashboard.bind("<<CustomClick>>", lambda e: show_dashboard())
-        btn_inventory.bind("<<CustomClick>>", lambda e: show_inventory())
-        btn_pos.bind("<<CustomClick>>", lambda e: show_pos())
-        if self.user["role"] == "admin":
-            btn_staff.bind("<<CustomClick>>", lambda e: show_staff())
-            btn_settings.bind("<<CustomClick>>", lambda e: show_settings())
-
-        # Load dashboard by default
-        activate(btn_dashboard)
-        show_dashboard()
-        
-    def load_icon(path, size=(20, 20)):
-        """Load and resize a PNG icon to fit tabs"""
-        img = Image.open(path).resize(size, Image.LANCZOS)
-        return ImageTk.PhotoImage(img)
-    
-        def resize_icons(self, event=None):
-                w = self.root.winfo_width()
-                size = (18, 18) if w < 800 else (24, 24)
-                self.icon_dashboard = load_icon("icons/dashboard.png", size=size)
-                self.icon_inventory = load_icon("icons/inventory.png", size=size)
-                self.icon_pos = load_icon("icons/pos.png", size=size)
-                self.icon_staff = load_icon("icons/staff.png", size=size)
-                self.icon_settings = load_icon("icons/settings.png", size=size)
-
-                # Update notebook tabs
-                self.nb.tab(0, image=self.icon_dashboard)
-                self.nb.tab(1, image=self.icon_inventory)
-                self.nb.tab(2, image=self.icon_pos)
-                if self.user["role"] == "admin":
-                    self.nb.tab(3, image=self.icon_staff)
-                    self.nb.tab(4, image=self.icon_settings)
-
-            # Bind to window resize
-                self.root.bind("<Configure>", self.resize_icons)
-        
-    def add_nav_button(text, command, icon_img):
-        btn = tk.Label(
-            nav_frame,
-            text=f"  {text}",  # little padding for icon space
-            image=icon_img,
-            compound="left",  # place icon on the left of text
-            font=("Segoe UI", 11, "bold"),
-            bg="#2c3e50",
-            fg="white",
-            anchor="w",
-            padx=15,
-            pady=12,
-            cursor="hand2"
-        )
-        btn.image = icon_img  # keep reference!
-        btn.pack(fill="x")
-
-        def on_enter(e): btn.config(bg="#34495e")
-        def on_leave(e):
-            if btn not in active_btn:
-                btn.config(bg="#2c3e50")
-        btn.bind("<Enter>", on_enter)
-        btn.bind("<Leave>", on_leave)
-        btn.bind("<Button-1>", lambda e: command())
-
-        nav_items.append(btn)
-        nav_texts.append(text)
-        return btn
 
     # ---------------- Staff Add Fix ----------------
     def _add_staff(self):
         def save(d):
             if not d.get('username') or not d.get('password'):
                 return messagebox.showerror('Error','Username and password required')
-            existing = self.db.query("SELECT id FROM users WHERE username=?;", (d['username'],))
+            existing = self.db.query_one("SELECT id FROM users WHERE username=?;", (d['username'],))
             if existing:
                 return messagebox.showerror('Error','Username already exists')
             self.db.execute(
@@ -1513,15 +1701,27 @@ class App:
 
     # ---------------- Login ----------------
     def _build_login(self):
-        for w in self.root.winfo_children(): w.destroy()
+        # drop the main UI (role-dependent, rebuilt per login) but keep the
+        # login frame itself alive: re-showing it is just a pack() call
+        for w in getattr(self, '_main_widgets', []):
+            w.destroy()
+        self._main_widgets = []
+        if getattr(self, '_login_frame', None) is not None:
+            self._login_pw.delete(0, 'end')
+            self._login_frame.pack(expand=True)
+            self._login_user.focus_set()
+            self.root.bind('<Return>', lambda e: self._try_login())
+            return
         frm = ttk.Frame(self.root, padding=20); frm.pack(expand=True)
+        self._login_frame = frm
 
-        # Pharmacy Name + Logo
+        # Pharmacy Name + Logo (decode logo.png once; logout/login rebuilds reuse it)
         top = ttk.Frame(frm); top.grid(row=0, column=0, columnspan=2, pady=(0,20))
         try:
-            logo_img = tk.PhotoImage(file=os.path.join(BASE_DIR, "logo.png"))
-            logo_lbl = ttk.Label(top, image=logo_img)
-            logo_lbl.image = logo_img
+            if getattr(self, '_logo_img', None) is None:
+                self._logo_img = tk.PhotoImage(file=os.path.join(BASE_DIR, "logo.png"))
+            logo_lbl = ttk.Label(top, image=self._logo_img)
+            logo_lbl.image = self._logo_img
             logo_lbl.pack()
         except Exception:
             ttk.Label(top, text='🏥', font=('Segoe UI', 40)).pack()
@@ -1548,19 +1748,26 @@ class App:
 
             u = user_e.get().strip(); p = pw_e.get().strip(); r = role_cb.get().strip()
             if not u or not p: return messagebox.showerror('Error','Enter username & password')
-            rows = self.db.query('SELECT * FROM users WHERE username=?;',(u,))
-            if not rows or rows[0]['password_hash'] != hash_pw(p) or rows[0]['role'] != r:
+            row = self.db.query_one(
+                'SELECT id, password_hash, role FROM users WHERE username=? LIMIT 1;',
+                (u,), raw=True)
+            if not row or row[1] != hash_pw(p) or row[2] != r:
                 return messagebox.showerror('Error','Invalid credentials or role')
-            self.user = {'id':rows[0]['id'],'username':u,'role':rows[0]['role']}
+            self.user = {'id': row[0], 'username': u, 'role': row[2]}
             self._build_main()
         ttk.Button(frm, text='Login', command=try_login).grid(row=4, column=0, columnspan=2, pady=8)
+        self._login_user, self._login_pw = user_e, pw_e
+        self._try_login = try_login
         user_e.focus_set()
         self.root.bind('<Return>', lambda e: try_login())
 
     # ---------------- Main ----------------
     def _build_main(self):
-        # Clear
-        for w in self.root.winfo_children():
+        # Hide the persistent login frame, drop any previous main widgets
+        if getattr(self, '_login_frame', None) is not None:
+            self._login_frame.pack_forget()
+        self.root.unbind('<Return>')
+        for w in getattr(self, '_main_widgets', []):
             w.destroy()
 
         # Top bar
@@ -1571,6 +1778,7 @@ class App:
 
         # Notebook (tabs)
         self.nb = ttk.Notebook(self.root); self.nb.pack(fill='both', expand=True, padx=8, pady=8)
+        self._main_widgets = [top, self.nb]
 
         role = self.user.get('role')
         # Create tabs based on role
@@ -1588,7 +1796,10 @@ class App:
 
         # Build tab contents
         if role == 'admin':
-            self._build_dashboard_tab()
+            # Dashboard content is built lazily when its tab is first shown
+            # (and rebuilt on later visits only after a committed write).
+            self._dash_built_tick = None
+            self.nb.bind('<<NotebookTabChanged>>', self._on_tab_changed)
             self._build_inventory_tab()
             self._build_pos_tab()
             self._build_sale_history_tab()
@@ -1602,8 +1813,93 @@ class App:
             self._build_pos_tab()
 
         # ---------------- Dashboard ----------------
+    def _on_tab_changed(self, event=None):
+        """Build the dashboard on first view; on revisits rebuild only if a
+        write committed since the last build (db.write_tick moved)."""
+        if self.nb.select() != str(self.tab_dashboard):
+            return
+        if getattr(self, '_dash_built_tick', None) != self.db.write_tick:
+            self._build_dashboard_tab()
+
     def _build_dashboard_tab(self):
+        """Kick off the dashboard read set on the dedicated DB thread, then
+        render on the Tk thread; cached data renders synchronously."""
+        self._dash_built_tick = self.db.write_tick
+        # Results are cached for up to a minute and invalidated by any DB
+        # write; on a miss all queries run off the Tk thread
+        cache_key = (self.db.write_tick, int(time.time()) // 60)
+        cached = getattr(self, '_dash_cache', None)
+        if cached is not None and cached[0] == cache_key:
+            self._render_dashboard(cached[1])
+            return
+
+        def work():
+            try:
+                data = self._fetch_dashboard_data()
+            except Exception:
+                return  # DB closed during shutdown
+            self._dash_cache = (cache_key, data)
+            self.root.after(0, self._render_dashboard, data)
+        _DB_POOL.submit(work)
+
+    def _fetch_dashboard_data(self):
+        """Run every dashboard query (stats, trend, recent sales, alerts).
+
+        Called on the _DB_POOL thread, which gets its own connection from
+        DB's thread-local cache."""
+        row = self.db.query_one(
+            "SELECT "
+            " (SELECT COALESCE(SUM(total),0) FROM sales"
+            "   WHERE created_at >= date('now','start of month')) AS monthly_sales,"
+            " (SELECT COUNT(*) FROM products) AS total_products,"
+            " (SELECT COUNT(*) FROM batches WHERE expiry_date IS NOT NULL"
+            "   AND expiry_date <= date('now','+30 day') AND quantity > 0) AS near_expiry,"
+            " (SELECT COUNT(*) FROM ("
+            "   SELECT product_id, SUM(quantity) AS q FROM batches GROUP BY product_id HAVING q <= 5"
+            " )) AS low_stock;"
+        )
+        trend_by_day = dict(self.db.query(
+            "SELECT date(created_at) AS d, COALESCE(SUM(total),0) AS s FROM sales "
+            "WHERE created_at >= date('now','-6 day') GROUP BY d;",
+            raw=True
+        ))
+        # recent sales + both alert lists in one round-trip; rows are tagged
+        # with a kind column and split back out below (the LIMITed subselects
+        # keep each branch's own ordering)
+        recent_rows, low_rows, exp_rows = [], [], []
+        rows = self.db.query(
+            "SELECT 'sale' AS kind, id, COALESCE(customer_name,'-'), total, substr(created_at,1,16) "
+            "FROM (SELECT * FROM sales ORDER BY id DESC LIMIT 6) "
+            "UNION ALL "
+            "SELECT 'low', name, qty, NULL, NULL FROM ("
+            " SELECT p.name AS name, COALESCE(SUM(b.quantity),0) AS qty"
+            " FROM products p LEFT JOIN batches b ON b.product_id=p.id"
+            " GROUP BY p.id HAVING qty <= 5 ORDER BY qty ASC LIMIT 4) "
+            "UNION ALL "
+            "SELECT 'exp', name, expiry_date, NULL, NULL FROM ("
+            " SELECT p.name AS name, b.expiry_date AS expiry_date FROM batches b"
+            " JOIN products p ON p.id=b.product_id"
+            " WHERE b.expiry_date IS NOT NULL"
+            " AND b.expiry_date <= date('now','+30 day')"
+            " AND b.quantity > 0 ORDER BY b.expiry_date ASC LIMIT 4);", raw=True
+        )
+        for kind, c1, c2, c3, c4 in rows:
+            if kind == 'sale':
+                recent_rows.append((c1, c2, c3, c4))
+            elif kind == 'low':
+                low_rows.append((c1, c2))
+            else:
+                exp_rows.append((c1, c2))
+        return (int(row['monthly_sales']), int(row['total_products']),
+                int(row['near_expiry']), int(row['low_stock']),
+                trend_by_day, recent_rows, low_rows, exp_rows)
+
+    def _render_dashboard(self, data):
         """Magical, modern dashboard with animated stats, hover effects, charts, and alerts."""
+        if not self.tab_dashboard.winfo_exists():
+            return  # logged out before the worker came back
+        (total_sales, total_products, near_expiry, low_stock,
+         trend_by_day, recent_rows, low_rows, exp_rows) = data
         for w in self.tab_dashboard.winfo_children():
             w.destroy()
 
@@ -1631,21 +1927,6 @@ class App:
         stats_frame.pack(fill="x", pady=10)
         stats_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
 
-        # Fetch stats
-        total_sales = int(self.db.query(
-            "SELECT COALESCE(SUM(total),0) AS s FROM sales WHERE strftime('%Y-%m',created_at)=strftime('%Y-%m','now');"
-        )[0]['s'])
-        total_products = int(self.db.query("SELECT COUNT(*) AS c FROM products;")[0]['c'])
-        near_expiry = int(self.db.query(
-            "SELECT COUNT(*) AS c FROM batches WHERE expiry_date IS NOT NULL "
-            "AND expiry_date <= date('now','+30 day') AND quantity > 0;"
-        )[0]['c'])
-        low_stock = int(self.db.query(
-            "SELECT COUNT(*) AS c FROM ("
-            " SELECT product_id, SUM(quantity) AS q FROM batches GROUP BY product_id HAVING q <= 5"
-            ");"
-        )[0]['c'])
-
         stats = [
             ("💰 Monthly Sales", total_sales, "#4e73df", lambda: self.nb.select(self.tab_pos)),
             ("📦 Products", total_products, "#1cc88a", lambda: self.nb.select(self.tab_inventory)),
@@ -1665,20 +1946,9 @@ class App:
                             bg=color, fg="white")
             val_lbl.pack(expand=True)
 
-            # Animated counter
-            def animate_number(lbl, target, delay=20):
-                current = 0
-                increment = max(1, target // 40)
-                def update():
-                    nonlocal current
-                    if current < target:
-                        current = min(current + increment, target)
-                        lbl.config(text=f"{current:,}")
-                        lbl.after(delay, update)
-                    else:
-                        lbl.config(text=f"{target:,}")
-                update()
-            animate_number(val_lbl, value)
+            # Animated counter: registered with the shared per-frame ticker
+            # below instead of scheduling one after() loop per card
+            self._dash_anims.append((val_lbl, value))
 
             # Hover effects
             def on_enter(e):
@@ -1698,9 +1968,11 @@ class App:
             return card
 
         # Render cards in grid
+        self._dash_anims = []
         for i, (title, value, color, onclick) in enumerate(stats):
             card = make_card(stats_frame, title, value, color, onclick)
             card.grid(row=0, column=i, sticky="nsew", padx=8, pady=5)
+        self._start_dash_anim()
 
         # ---------------- CHARTS ----------------
         charts_frame = ttk.Frame(main_container)
@@ -1709,29 +1981,40 @@ class App:
         charts_frame.grid_columnconfigure((0, 1), weight=1)
 
         if MATPLOTLIB_AVAILABLE:
-            import matplotlib.pyplot as plt
-            plt.style.use("seaborn-v0_8")
+            # style selection and Figure objects are kept across dashboard
+            # rebuilds; only the axes content and the Tk canvas widgets
+            # (whose parent frame was just destroyed) are recreated
+            if not getattr(self, '_mpl_style_set', False):
+                import matplotlib.pyplot as plt
+                plt.style.use("seaborn-v0_8")
+                self._mpl_style_set = True
+            if getattr(self, '_sales_fig', None) is None:
+                self._sales_fig = Figure(figsize=(5, 3), dpi=90)
+                self._sales_fig.add_subplot(111)
+            if getattr(self, '_inv_fig', None) is None:
+                self._inv_fig = Figure(figsize=(5, 3), dpi=90)
+                self._inv_fig.add_subplot(111)
 
             # Sales trend chart
-            sales_fig = Figure(figsize=(5, 3), dpi=90)
-            ax1 = sales_fig.add_subplot(111)
+            ax1 = self._sales_fig.axes[0]
+            ax1.clear()
+            # week trend comes from the cached GROUP BY; fill missing days
             days, totals = [], []
             for i in range(6, -1, -1):
                 d = (datetime.now().date() - timedelta(days=i)).strftime('%Y-%m-%d')
                 days.append(d[5:])
-                r = self.db.query("SELECT COALESCE(SUM(total),0) AS s FROM sales WHERE date(created_at)=?;", (d,))
-                totals.append(float(r[0]['s']))
+                totals.append(float(trend_by_day.get(d, 0)))
             ax1.fill_between(days, totals, color="#4e73df", alpha=0.3)
             ax1.plot(days, totals, marker="o", color="#4e73df", linewidth=2)
             ax1.set_title("Sales - Last 7 Days")
             ax1.grid(True, linestyle="--", alpha=0.5)
-            canvas1 = FigureCanvasTkAgg(sales_fig, master=charts_frame)
-            canvas1.draw()
+            canvas1 = FigureCanvasTkAgg(self._sales_fig, master=charts_frame)
             canvas1.get_tk_widget().grid(row=0, column=0, sticky="nsew", padx=8)
+            canvas1.draw_idle()
 
             # Inventory chart
-            inv_fig = Figure(figsize=(5, 3), dpi=90)
-            ax2 = inv_fig.add_subplot(111)
+            ax2 = self._inv_fig.axes[0]
+            ax2.clear()
             labels = ["Products", "Near Expiry", "Low Stock"]
             values = [total_products, near_expiry, low_stock]
             colors = ["#1cc88a", "#f6c23e", "#e74a3b"]
@@ -1742,9 +2025,9 @@ class App:
                         str(int(height)), ha="center", va="bottom", fontsize=9)
             ax2.set_title("Inventory Status")
             ax2.grid(True, linestyle="--", alpha=0.5)
-            canvas2 = FigureCanvasTkAgg(inv_fig, master=charts_frame)
-            canvas2.draw()
+            canvas2 = FigureCanvasTkAgg(self._inv_fig, master=charts_frame)
             canvas2.get_tk_widget().grid(row=0, column=1, sticky="nsew", padx=8)
+            canvas2.draw_idle()
 
         # ---------------- RECENT SALES & ALERTS ----------------
         bottom_frame = ttk.Frame(main_container)
@@ -1763,12 +2046,8 @@ class App:
         tree.column("total", width=80, anchor="e")
         tree.column("date", width=120, anchor="center")
         tree.pack(fill="both", expand=True)
-        rows = self.db.query(
-            "SELECT id, COALESCE(customer_name,'-') AS customer, total, substr(created_at,1,16) AS date "
-            "FROM sales ORDER BY id DESC LIMIT 6;"
-        )
-        for r in rows:
-            tree.insert("", "end", values=(r['id'], r['customer'], f"${r['total']:.2f}", r['date']))
+        for sid, customer, total, date in recent_rows:
+            tree.insert("", "end", values=(sid, customer, f"${total:.2f}", date))
 
         # Alerts
         alerts_frame = ttk.LabelFrame(bottom_frame, text="⚠️ Alerts", padding=8)
@@ -1777,22 +2056,29 @@ class App:
         for c in ("type", "item", "detail"):
             alert_tree.heading(c, text=c.capitalize())
         alert_tree.pack(fill="both", expand=True)
-        low_rows = self.db.query(
-            "SELECT p.name, COALESCE(SUM(b.quantity),0) AS qty "
-            "FROM products p LEFT JOIN batches b ON b.product_id=p.id "
-            "GROUP BY p.id HAVING qty <= 5 ORDER BY qty ASC LIMIT 4;"
-        )
-        for r in low_rows:
-            alert_tree.insert("", "end", values=("Low Stock", r['name'], f"{r['qty']} units left"))
-        exp_rows = self.db.query(
-            "SELECT p.name, b.expiry_date FROM batches b "
-            "JOIN products p ON p.id=b.product_id "
-            "WHERE b.expiry_date IS NOT NULL "
-            "AND b.expiry_date <= date('now','+30 day') "
-            "AND b.quantity > 0 ORDER BY b.expiry_date ASC LIMIT 4;"
-        )
-        for r in exp_rows:
-            alert_tree.insert("", "end", values=("Near Expiry", r['name'], f"Expires {r['expiry_date']}"))
+        for name, qty in low_rows:
+            alert_tree.insert("", "end", values=("Low Stock", name, f"{qty} units left"))
+        for name, expiry_date in exp_rows:
+            alert_tree.insert("", "end", values=("Near Expiry", name, f"Expires {expiry_date}"))
+
+    def _start_dash_anim(self, duration_ms=800):
+        """Drive all stat-card counters from one ~30 fps after() loop; progress
+        is time-based so the duration is fixed regardless of target size."""
+        if not self._dash_anims:
+            return
+        self._dash_anim_t0 = time.monotonic()
+        self._dash_anim_dur = duration_ms / 1000.0
+        self._tick_dash_anim()
+
+    def _tick_dash_anim(self):
+        frac = min(1.0, (time.monotonic() - self._dash_anim_t0) / self._dash_anim_dur)
+        try:
+            for lbl, target in self._dash_anims:
+                lbl.config(text=f"{int(target * frac):,}")
+        except tk.TclError:
+            return  # dashboard was rebuilt mid-animation; labels are gone
+        if frac < 1.0:
+            self.root.after(33, self._tick_dash_anim)
 
 
 
@@ -1802,59 +2088,97 @@ class App:
         path = filedialog.askopenfilename(filetypes=[('CSV Files','*.csv'),('Excel Files','*.xlsx')])
         if not path:
             return
-        rows = []
+        # parse + insert on the I/O pool so multi-MB files don't freeze the
+        # UI; connections are per-thread so the worker gets its own
+        _IO_POOL.submit(self._import_inventory_work, inv_type, path)
+
+    def _import_inventory_work(self, inv_type, path):
         try:
+            # both readers produce a header list plus plain value tuples; no
+            # dict per row, and openpyxl streams the sheet (read_only) rather
+            # than building the whole workbook in memory
             if path.lower().endswith('.csv'):
                 with open(path, newline='', encoding='utf-8') as f:
-                    rows = list(csv.DictReader(f))
+                    rdr = csv.reader(f)
+                    headers = next(rdr, [])
+                    rows = list(rdr)
             elif path.lower().endswith('.xlsx') and OPENPYXL_AVAILABLE:
                 from openpyxl import load_workbook
-                wb = load_workbook(path); ws = wb.active
-                headers = [c.value for c in next(ws.iter_rows(max_row=1))]
-                for row in ws.iter_rows(min_row=2, values_only=True):
-                    rows.append(dict(zip(headers, row)))
+                wb = load_workbook(path, read_only=True, data_only=True)
+                try:
+                    it = wb.active.iter_rows(values_only=True)
+                    headers = list(next(it, ()))
+                    rows = list(it)
+                finally:
+                    wb.close()
             else:
-                messagebox.showerror('Error','Unsupported file type')
+                self.root.after(0, lambda: messagebox.showerror('Error','Unsupported file type'))
                 return
 
-            for r in rows:
-                if inv_type in ('medical','nonmedical'):
-                    self.db.execute(
-                        """INSERT OR IGNORE INTO products(name,is_medical,sku,unit,sale_price)
-                        VALUES(?,?,?,?,?)""",
-                        (r.get('name'), 1 if inv_type=='medical' else 0, r.get('sku'), r.get('unit'), float(r.get('price') or 0))
-                    )
-                elif inv_type == 'suppliers':
-                    self.db.execute("INSERT OR IGNORE INTO suppliers(name,phone,email,address) VALUES(?,?,?,?)",
-                        (r.get('name'), r.get('phone'), r.get('email'), r.get('address')))
-                elif inv_type == 'manufacturers':
-                    self.db.execute("INSERT OR IGNORE INTO manufacturers(name,contact,notes) VALUES(?,?,?)",
-                        (r.get('name'), r.get('contact'), r.get('notes')))
-                elif inv_type == 'categories':
-                    self.db.execute("INSERT OR IGNORE INTO categories(name,notes) VALUES(?,?)",
-                        (r.get('name'), r.get('notes')))
-                elif inv_type == 'formulas':
-                    self.db.execute("INSERT OR IGNORE INTO formulas(name,composition) VALUES(?,?)",
-                        (r.get('name'), r.get('composition')))
-                elif inv_type == 'batches':
-                    pid = self.db.query("SELECT id FROM products WHERE name=?", (r.get('product'),))
-                    sid = self.db.query("SELECT id FROM suppliers WHERE name=?", (r.get('supplier'),))
-                    pid = pid[0]['id'] if pid else None
-                    sid = sid[0]['id'] if sid else None
-                    if pid:
-                        self.db.execute(
-                            """INSERT INTO batches(product_id,supplier_id,batch_no,quantity,expiry_date,cost_price,created_at)
-                            VALUES(?,?,?,?,?,?,?)""",
-                            (pid, sid, r.get('batch_no'), int(r.get('quantity') or 0), r.get('expiry'), float(r.get('cost_price') or 0), now_str())
-                        )
-
-            messagebox.showinfo('Import','Data imported successfully!')
-            try:
-                self._inv_refresh_all()
-            except Exception:
-                pass
+            idx = {h: i for i, h in enumerate(headers)}
+
+            def col(r, name):
+                i = idx.get(name)
+                return r[i] if i is not None and i < len(r) else None
+
+            # one executemany per file inside a single transaction instead of
+            # a commit per row — bulk imports go from O(rows) fsyncs to one
+            if inv_type in ('medical','nonmedical'):
+                is_med = 1 if inv_type == 'medical' else 0
+                params = [(col(r,'name'), is_med, col(r,'sku'), col(r,'unit'), float(col(r,'price') or 0))
+                          for r in rows]
+                with self.db.transaction() as cur:
+                    cur.executemany(
+                        "INSERT OR IGNORE INTO products(name,is_medical,sku,unit,sale_price) VALUES(?,?,?,?,?)",
+                        params)
+            elif inv_type == 'suppliers':
+                with self.db.transaction() as cur:
+                    cur.executemany("INSERT OR IGNORE INTO suppliers(name,phone,email,address) VALUES(?,?,?,?)",
+                        [(col(r,'name'), col(r,'phone'), col(r,'email'), col(r,'address')) for r in rows])
+            elif inv_type == 'manufacturers':
+                with self.db.transaction() as cur:
+                    cur.executemany("INSERT OR IGNORE INTO manufacturers(name,contact,notes) VALUES(?,?,?)",
+                        [(col(r,'name'), col(r,'contact'), col(r,'notes')) for r in rows])
+            elif inv_type == 'categories':
+                with self.db.transaction() as cur:
+                    cur.executemany("INSERT OR IGNORE INTO categories(name,notes) VALUES(?,?)",
+                        [(col(r,'name'), col(r,'notes')) for r in rows])
+            elif inv_type == 'formulas':
+                with self.db.transaction() as cur:
+                    cur.executemany("INSERT OR IGNORE INTO formulas(name,composition) VALUES(?,?)",
+                        [(col(r,'name'), col(r,'composition')) for r in rows])
+            elif inv_type == 'batches':
+                # resolve names to ids with one IN query per table, not two per row
+                def name_map(table, names):
+                    names = [n for n in set(names) if n]
+                    if not names:
+                        return {}
+                    ph = ",".join("?" * len(names))
+                    return dict(self.db.query(
+                        f"SELECT name, id FROM {table} WHERE name IN ({ph})", tuple(names), raw=True))
+                pids = name_map('products', (col(r,'product') for r in rows))
+                sids = name_map('suppliers', (col(r,'supplier') for r in rows))
+                created = now_str()
+                params = [
+                    (pids[col(r,'product')], sids.get(col(r,'supplier')), col(r,'batch_no'),
+                     int(col(r,'quantity') or 0), col(r,'expiry'), float(col(r,'cost_price') or 0), created)
+                    for r in rows if col(r,'product') in pids
+                ]
+                with self.db.transaction() as cur:
+                    cur.executemany(
+                        "INSERT INTO batches(product_id,supplier_id,batch_no,quantity,expiry_date,cost_price,created_at) "
+                        "VALUES(?,?,?,?,?,?,?)", params)
+
+            def done():
+                messagebox.showinfo('Import','Data imported successfully!')
+                try:
+                    self._inv_refresh_all()
+                except Exception:
+                    pass
+            self.root.after(0, done)
         except Exception as e:
-            messagebox.showerror('Import Error', str(e))
+            err = str(e)
+            self.root.after(0, lambda: messagebox.showerror('Import Error', err))
     
     def _build_inventory_tab(self):
         for w in self.tab_inventory.winfo_children(): w.destroy()
@@ -1862,82 +2186,34 @@ class App:
         ttk.Label(frame, text='Inventory', font=('Segoe UI',14,'bold')).pack(anchor='w', padx=10, pady=(6,0))
         inv_nb = ttk.Notebook(frame); inv_nb.pack(fill='both', expand=True, padx=8, pady=8)
 
-        med_tab = ttk.Frame(inv_nb); inv_nb.add(med_tab, text='Medical Products')
-        # search frame for Medical Products
-        med_tab_search_fr = ttk.Frame(med_tab)
-        med_tab_search_fr.pack(fill='x', padx=8, pady=(6,0))
-        ttk.Label(med_tab_search_fr, text='🔍').pack(side='left')
-        self.med_tab_search_var = tk.StringVar()
-        med_tab_search_entry = PlaceholderEntry(med_tab_search_fr, placeholder='Search...', textvariable=self.med_tab_search_var, width=36)
-        med_tab_search_entry.pack(side='left', padx=6)
-        # wire trace
-        self.med_tab_search_var.trace_add('write', lambda *a, t='Medical Products': self._filter_tab(t, self.med_tab_search_var.get()))
-
-        nonmed_tab = ttk.Frame(inv_nb); inv_nb.add(nonmed_tab, text='Non-Medical Products')
-        # search frame for Non-Medical Products
-        nonmed_tab_search_fr = ttk.Frame(nonmed_tab)
-        nonmed_tab_search_fr.pack(fill='x', padx=8, pady=(6,0))
-        ttk.Label(nonmed_tab_search_fr, text='🔍').pack(side='left')
-        self.nonmed_tab_search_var = tk.StringVar()
-        nonmed_tab_search_entry = PlaceholderEntry(nonmed_tab_search_fr, placeholder='Search...', textvariable=self.nonmed_tab_search_var, width=36)
-        nonmed_tab_search_entry.pack(side='left', padx=6)
-        # wire trace
-        self.nonmed_tab_search_var.trace_add('write', lambda *a, t='Non-Medical Products': self._filter_tab(t, self.nonmed_tab_search_var.get()))
-
-        suppliers_tab = ttk.Frame(inv_nb); inv_nb.add(suppliers_tab, text='Suppliers')
-        # search frame for Suppliers
-        suppliers_tab_search_fr = ttk.Frame(suppliers_tab)
-        suppliers_tab_search_fr.pack(fill='x', padx=8, pady=(6,0))
-        ttk.Label(suppliers_tab_search_fr, text='🔍').pack(side='left')
-        self.suppliers_tab_search_var = tk.StringVar()
-        suppliers_tab_search_entry = PlaceholderEntry(suppliers_tab_search_fr, placeholder='Search...', textvariable=self.suppliers_tab_search_var, width=36)
-        suppliers_tab_search_entry.pack(side='left', padx=6)
-        # wire trace
-        self.suppliers_tab_search_var.trace_add('write', lambda *a, t='Suppliers': self._filter_tab(t, self.suppliers_tab_search_var.get()))
-
-        manufacturers_tab = ttk.Frame(inv_nb); inv_nb.add(manufacturers_tab, text='Manufacturers')
-        # search frame for Manufacturers
-        manufacturers_tab_search_fr = ttk.Frame(manufacturers_tab)
-        manufacturers_tab_search_fr.pack(fill='x', padx=8, pady=(6,0))
-        ttk.Label(manufacturers_tab_search_fr, text='🔍').pack(side='left')
-        self.manufacturers_tab_search_var = tk.StringVar()
-        manufacturers_tab_search_entry = PlaceholderEntry(manufacturers_tab_search_fr, placeholder='Search...', textvariable=self.manufacturers_tab_search_var, width=36)
-        manufacturers_tab_search_entry.pack(side='left', padx=6)
-        # wire trace
-        self.manufacturers_tab_search_var.trace_add('write', lambda *a, t='Manufacturers': self._filter_tab(t, self.manufacturers_tab_search_var.get()))
-
-        categories_tab = ttk.Frame(inv_nb); inv_nb.add(categories_tab, text='Categories')
-        # search frame for Categories
-        categories_tab_search_fr = ttk.Frame(categories_tab)
-        categories_tab_search_fr.pack(fill='x', padx=8, pady=(6,0))
-        ttk.Label(categories_tab_search_fr, text='🔍').pack(side='left')
-        self.categories_tab_search_var = tk.StringVar()
-        categories_tab_search_entry = PlaceholderEntry(categories_tab_search_fr, placeholder='Search...', textvariable=self.categories_tab_search_var, width=36)
-        categories_tab_search_entry.pack(side='left', padx=6)
-        # wire trace
-        self.categories_tab_search_var.trace_add('write', lambda *a, t='Categories': self._filter_tab(t, self.categories_tab_search_var.get()))
-
-        formulas_tab = ttk.Frame(inv_nb); inv_nb.add(formulas_tab, text='Formulas')
-        # search frame for Formulas
-        formulas_tab_search_fr = ttk.Frame(formulas_tab)
-        formulas_tab_search_fr.pack(fill='x', padx=8, pady=(6,0))
-        ttk.Label(formulas_tab_search_fr, text='🔍').pack(side='left')
-        self.formulas_tab_search_var = tk.StringVar()
-        formulas_tab_search_entry = PlaceholderEntry(formulas_tab_search_fr, placeholder='Search...', textvariable=self.formulas_tab_search_var, width=36)
-        formulas_tab_search_entry.pack(side='left', padx=6)
-        # wire trace
-        self.formulas_tab_search_var.trace_add('write', lambda *a, t='Formulas': self._filter_tab(t, self.formulas_tab_search_var.get()))
-
-        batches_tab = ttk.Frame(inv_nb); inv_nb.add(batches_tab, text='Batches')
-        # search frame for Batches
-        batches_tab_search_fr = ttk.Frame(batches_tab)
-        batches_tab_search_fr.pack(fill='x', padx=8, pady=(6,0))
-        ttk.Label(batches_tab_search_fr, text='🔍').pack(side='left')
-        self.batches_tab_search_var = tk.StringVar()
-        batches_tab_search_entry = PlaceholderEntry(batches_tab_search_fr, placeholder='Search...', textvariable=self.batches_tab_search_var, width=36)
-        batches_tab_search_entry.pack(side='left', padx=6)
-        # wire trace
-        self.batches_tab_search_var.trace_add('write', lambda *a, t='Batches': self._filter_tab(t, self.batches_tab_search_var.get()))
+        # sub-tabs share an identical search bar, so build them in one loop
+        # (one frame + StringVar + debounced trace each) instead of seven
+        # copies of the same block
+        sub_tabs = {}
+        for title, prefix in (('Medical Products', 'med'),
+                              ('Non-Medical Products', 'nonmed'),
+                              ('Suppliers', 'suppliers'),
+                              ('Manufacturers', 'manufacturers'),
+                              ('Categories', 'categories'),
+                              ('Formulas', 'formulas'),
+                              ('Batches', 'batches')):
+            tab = ttk.Frame(inv_nb); inv_nb.add(tab, text=title)
+            sub_tabs[title] = tab
+            search_fr = ttk.Frame(tab)
+            search_fr.pack(fill='x', padx=8, pady=(6,0))
+            ttk.Label(search_fr, text='🔍').pack(side='left')
+            var = tk.StringVar()
+            setattr(self, f'{prefix}_tab_search_var', var)
+            PlaceholderEntry(search_fr, placeholder='Search...', textvariable=var, width=36).pack(side='left', padx=6)
+            var.trace_add('write', lambda *a, t=title, v=var: self._schedule_filter(t, v))
+
+        med_tab = sub_tabs['Medical Products']
+        nonmed_tab = sub_tabs['Non-Medical Products']
+        suppliers_tab = sub_tabs['Suppliers']
+        manufacturers_tab = sub_tabs['Manufacturers']
+        categories_tab = sub_tabs['Categories']
+        formulas_tab = sub_tabs['Formulas']
+        batches_tab = sub_tabs['Batches']
 
 
         cols = ('id','name','sku','unit','category','manufacturer','price','stock')
@@ -1947,15 +2223,16 @@ class App:
             # headings
             for c in cols:
                 tree.heading(c, text=c.capitalize())
-            # column alignments & widths
-            tree.column('id', width=60, anchor='center')
+            # column alignments & widths; fixed columns don't stretch, so Tk
+            # skips the column autofit pass during the bulk fill after login
+            tree.column('id', width=60, anchor='center', stretch=False)
             tree.column('name', width=180, anchor='w')
-            tree.column('sku', width=100, anchor='center')
-            tree.column('unit', width=100, anchor='center')
-            tree.column('category', width=140, anchor='w')
-            tree.column('manufacturer', width=140, anchor='w')
-            tree.column('price', width=100, anchor='e')
-            tree.column('stock', width=80, anchor='center')
+            tree.column('sku', width=100, anchor='center', stretch=False)
+            tree.column('unit', width=100, anchor='center', stretch=False)
+            tree.column('category', width=140, anchor='w', stretch=False)
+            tree.column('manufacturer', width=140, anchor='w', stretch=False)
+            tree.column('price', width=100, anchor='e', stretch=False)
+            tree.column('stock', width=80, anchor='center', stretch=False)
             tree.pack(fill='both', expand=True, padx=8, pady=8)
             return tree
 
@@ -2063,118 +2340,255 @@ class App:
             tree = getattr(self, tree_attr, None)
             if not tree:
                 return
-            
-            # Clear the tree
-            tree.delete(*tree.get_children())
-            
-            # If empty term, load all data
-            if not term:
+
+            # rows are queried and inserted once per tab, then filtering is
+            # pure detach/reattach on the cached iids — no DB or reinsert
+            # work per keystroke (cache dropped by _inv_refresh_all)
+            cache = getattr(self, '_tab_filter_cache', None)
+            if cache is None:
+                cache = self._tab_filter_cache = {}
+            full = getattr(self, '_tab_is_full', None)
+            if full is None:
+                full = self._tab_is_full = {}
+            entries = cache.get(tab_name)
+            if entries is None:
                 data = data_getter()
-                for item_data in data:
-                    tree.insert('', 'end', values=item_data)
+                self._bulk_fill_tree(tree, data, use_iid=True)
+                entries = [(str(row[0]), ' '.join(map(str, row)).lower()) for row in data]
+                cache[tab_name] = entries
+                full[tab_name] = True
+            if not term:
+                # clearing the box when nothing is detached costs nothing
+                if not full.get(tab_name):
+                    for iid, _ in entries:
+                        tree.reattach(iid, '', 'end')
+                    full[tab_name] = True
                 return
-            
-            # Filter: show only matching items
-            data = data_getter()
-            for item_data in data:
-                if any(term in str(v).lower() for v in item_data):
-                    tree.insert('', 'end', values=item_data)
-                    
+            for iid, text in entries:
+                if term in text:
+                    tree.reattach(iid, '', 'end')
+                else:
+                    tree.detach(iid)
+            full[tab_name] = False
+
         except Exception as e:
             print(f"Filter error in {tab_name}: {e}")
 
+    def _schedule_filter(self, tab_name, var):
+        """Debounce search-box traces so a burst of keystrokes runs one scan."""
+        jobs = getattr(self, '_filter_jobs', None)
+        if jobs is None:
+            jobs = self._filter_jobs = {}
+        job = jobs.pop(tab_name, None)
+        if job:
+            self.root.after_cancel(job)
+        jobs[tab_name] = self.root.after(
+            150, lambda: (jobs.pop(tab_name, None), self._filter_tab(tab_name, var.get())))
+
+    def _bulk_fill_tree(self, tree, rows, use_iid=False):
+        """Refill a Treeview while it is unmapped: Tk then does one relayout
+        when the widget reappears instead of reflowing per insert."""
+        manager = tree.winfo_manager()
+        info = None
+        if manager == 'pack':
+            info = tree.pack_info()
+            tree.pack_forget()
+        elif manager == 'grid':
+            info = tree.grid_info()
+            tree.grid_forget()
+        try:
+            tree.delete(*tree.get_children())
+            insert = tree.insert
+            if use_iid:
+                for row in rows:
+                    insert('', 'end', iid=row[0], values=row)
+            else:
+                for row in rows:
+                    insert('', 'end', values=row)
+        finally:
+            if manager == 'pack':
+                tree.pack(**info)
+            elif manager == 'grid':
+                info.pop('in', None)
+                tree.grid(**info)
+
+    def _product_rows(self, is_medical):
+        # aggregate batches once (GROUP BY) instead of a correlated subquery per
+        # product; NULL handling lives in SQL so rows come back as ready tuples
+        # and Python only formats the price column
+        rows = self.db.query('''SELECT p.id,p.name,COALESCE(p.sku,''),COALESCE(p.unit,''),COALESCE(c.name,''),COALESCE(m.name,''),p.sale_price,
+            COALESCE(s.stock,0) FROM products p
+            LEFT JOIN (SELECT product_id, SUM(quantity) AS stock FROM batches GROUP BY product_id) s ON s.product_id=p.id
+            LEFT JOIN categories c ON p.category_id=c.id LEFT JOIN manufacturers m ON p.manufacturer_id=m.id WHERE p.is_medical=? ORDER BY p.name;''',
+            (is_medical,), raw=True)
+        return [(pid, name, sku, unit, cat, man, f"{price:.2f}", stock)
+                for pid, name, sku, unit, cat, man, price, stock in rows]
+
     def _get_medical_data(self):
-        rows = self.db.query('''SELECT p.id,p.name,p.sku,p.unit,c.name as category,m.name as manufacturer,p.sale_price as price,
-            COALESCE((SELECT SUM(quantity) FROM batches b WHERE b.product_id=p.id),0) AS stock FROM products p
-            LEFT JOIN categories c ON p.category_id=c.id LEFT JOIN manufacturers m ON p.manufacturer_id=m.id WHERE p.is_medical=1 ORDER BY p.name;''')
-        return [(r['id'], r['name'], r['sku'] or '', r.get('unit','') or '', r.get('category') or '', r.get('manufacturer') or '', f"{r['price']:.2f}", r['stock']) for r in rows]
+        return self._product_rows(1)
 
     def _get_nonmedical_data(self):
-        rows = self.db.query('''SELECT p.id,p.name,p.sku,p.unit,c.name as category,m.name as manufacturer,p.sale_price as price,
-            COALESCE((SELECT SUM(quantity) FROM batches b WHERE b.product_id=p.id),0) AS stock FROM products p
-            LEFT JOIN categories c ON p.category_id=c.id LEFT JOIN manufacturers m ON p.manufacturer_id=m.id WHERE p.is_medical=0 ORDER BY p.name;''')
-        return [(r['id'], r['name'], r['sku'] or '', r.get('unit','') or '', r.get('category') or '', r.get('manufacturer') or '', f"{r['price']:.2f}", r['stock']) for r in rows]
+        return self._product_rows(0)
 
     def _get_suppliers_data(self):
-        rows = self.db.query('SELECT id,name,phone,email,address FROM suppliers ORDER BY name;')
-        return [(r['id'], r['name'], r['phone'] or '', r['email'] or '', r['address'] or '') for r in rows]
+        return self.db.query("SELECT id,name,COALESCE(phone,''),COALESCE(email,''),COALESCE(address,'') FROM suppliers ORDER BY name;", raw=True)
 
     def _get_manufacturers_data(self):
-        rows = self.db.query('SELECT id,name,contact,notes FROM manufacturers ORDER BY name;')
-        return [(r['id'], r['name'], r['contact'] or '', r['notes'] or '') for r in rows]
+        return self.db.query("SELECT id,name,COALESCE(contact,''),COALESCE(notes,'') FROM manufacturers ORDER BY name;", raw=True)
 
     def _get_categories_data(self):
-        rows = self.db.query('SELECT id,name,notes FROM categories ORDER BY name;')
-        return [(r['id'], r['name'], r['notes'] or '') for r in rows]
+        return self.db.query("SELECT id,name,COALESCE(notes,'') FROM categories ORDER BY name;", raw=True)
 
     def _get_formulas_data(self):
-        rows = self.db.query('SELECT id,name,composition FROM formulas ORDER BY name;')
-        return [(r['id'], r['name'], r['composition'] or '') for r in rows]
+        return self.db.query("SELECT id,name,COALESCE(composition,'') FROM formulas ORDER BY name;", raw=True)
 
     def _get_batches_data(self):
-        rows = self.db.query('SELECT b.id, p.name as product, b.batch_no, b.quantity, b.expiry_date, s.name as supplier FROM batches b LEFT JOIN products p ON p.id=b.product_id LEFT JOIN suppliers s ON s.id=b.supplier_id ORDER BY b.id DESC;')
-        return [(r['id'], r['product'], r['batch_no'] or '', r['quantity'], r['expiry_date'] or '', r['supplier'] or '') for r in rows]
+        return self.db.query("SELECT b.id, p.name, COALESCE(b.batch_no,''), b.quantity, COALESCE(b.expiry_date,''), COALESCE(s.name,'') FROM batches b LEFT JOIN products p ON p.id=b.product_id LEFT JOIN suppliers s ON s.id=b.supplier_id ORDER BY b.id DESC;", raw=True)
     
+    # kind -> (tree attribute, data getter, filter-cache tab name)
+    _INV_TREES = {
+        'med': ('_med_tree', '_get_medical_data', 'Medical Products'),
+        'nonmed': ('_nonmed_tree', '_get_nonmedical_data', 'Non-Medical Products'),
+        'sup': ('_sup_tree', '_get_suppliers_data', 'Suppliers'),
+        'man': ('_man_tree', '_get_manufacturers_data', 'Manufacturers'),
+        'cat': ('_cat_tree', '_get_categories_data', 'Categories'),
+        'form': ('_form_tree', '_get_formulas_data', 'Formulas'),
+        'batch': ('_batch_tree', '_get_batches_data', 'Batches'),
+    }
+
     def _inv_refresh_all(self):
-        # Medical Products
-        self._med_tree.delete(*self._med_tree.get_children())
-        for item_data in self._get_medical_data():
-            self._med_tree.insert('', 'end', iid=item_data[0], values=item_data)
-
-        # Non-Medical Products
-        self._nonmed_tree.delete(*self._nonmed_tree.get_children())
-        for item_data in self._get_nonmedical_data():
-            self._nonmed_tree.insert('', 'end', iid=item_data[0], values=item_data)
-
-        # Suppliers
-        self._sup_tree.delete(*self._sup_tree.get_children())
-        for item_data in self._get_suppliers_data():
-            self._sup_tree.insert('', 'end', values=item_data)
-
-        # Manufacturers
-        self._man_tree.delete(*self._man_tree.get_children())
-        for item_data in self._get_manufacturers_data():
-            self._man_tree.insert('', 'end', values=item_data)
-
-        # Categories
-        self._cat_tree.delete(*self._cat_tree.get_children())
-        for item_data in self._get_categories_data():
-            self._cat_tree.insert('', 'end', values=item_data)
-
-        # Formulas
-        self._form_tree.delete(*self._form_tree.get_children())
-        for item_data in self._get_formulas_data():
-            self._form_tree.insert('', 'end', values=item_data)
-
-        # Batches
-        self._batch_tree.delete(*self._batch_tree.get_children())
-        for item_data in self._get_batches_data():
-            self._batch_tree.insert('', 'end', values=item_data)
+        # All product CRUD paths funnel through here, so this is the one spot
+        # that needs to drop stale autocomplete results.
+        invalidate_product_cache()
+        getattr(self, '_tab_filter_cache', {}).clear()
+        getattr(self, '_tab_is_full', {}).clear()
+        getattr(self, '_lookup_cache', {}).clear()
+        self._submit_inv_refresh([(attr, getattr(self, getter))
+                                  for attr, getter, _ in self._INV_TREES.values()])
+
+    def _inv_refresh_only(self, *kinds):
+        """Targeted _inv_refresh_all: re-query just the trees a point edit
+        touched (e.g. a supplier change refreshes Suppliers and Batches, not
+        all seven tabs)."""
+        if {'med', 'nonmed'} & set(kinds):
+            invalidate_product_cache()
+        lookup_tables = {'med': 'products', 'nonmed': 'products',
+                         'sup': 'suppliers', 'man': 'manufacturers',
+                         'cat': 'categories', 'form': 'formulas'}
+        specs = []
+        for kind in kinds:
+            attr, getter, tab_name = self._INV_TREES[kind]
+            getattr(self, '_tab_filter_cache', {}).pop(tab_name, None)
+            getattr(self, '_tab_is_full', {}).pop(tab_name, None)
+            getattr(self, '_lookup_cache', {}).pop(lookup_tables.get(kind), None)
+            specs.append((attr, getattr(self, getter)))
+        self._submit_inv_refresh(specs)
+
+    def _submit_inv_refresh(self, specs):
+        # the queries run on the DB thread and each tree refills on the
+        # Tk thread as its rows arrive, so the UI never blocks on the scans
+        def work():
+            # one read transaction around all seven SELECTs: the WAL snapshot
+            # is taken once and the statement cache stays hot, instead of
+            # paying begin/snapshot overhead per query
+            try:
+                con = self.db.connect()
+                con.execute('BEGIN')
+            except Exception:
+                con = None
+            try:
+                for attr, getter in specs:
+                    try:
+                        rows = getter()
+                    except Exception:
+                        continue  # DB closed during shutdown
+                    self.root.after(0, self._inv_fill_tree, attr, rows)
+            finally:
+                if con is not None:
+                    try:
+                        con.commit()
+                    except Exception:
+                        pass
+        _DB_POOL.submit(work)
+
+    def _inv_fill_tree(self, attr, rows):
+        tree = getattr(self, attr, None)
+        if tree is None:
+            return
+        try:
+            self._bulk_fill_tree(tree, rows, use_iid=True)
+        except tk.TclError:
+            pass  # inventory tab was rebuilt before the rows arrived
             
+    def _upsert_named(self, table, name, cur=None):
+        """Resolve a lookup-table name to its id, inserting it if new — one
+        round-trip instead of SELECT-then-INSERT (name is UNIQUE on the
+        categories/manufacturers/formulas/suppliers tables).
+
+        Pass the cursor from an open DB.transaction() to join the caller's
+        transaction instead of committing on its own."""
+        if not name:
+            return None
+        sql = (f"INSERT INTO {table}(name) VALUES(?) "
+               "ON CONFLICT(name) DO UPDATE SET name=excluded.name RETURNING id;")
+        if cur is not None:
+            row = cur.execute(sql, (name,)).fetchone()
+        else:
+            row = self.db.execute_returning(sql, (name,))
+        getattr(self, '_lookup_cache', {}).pop(table, None)
+        return row['id'] if row else None
+
+    def _get_names(self, table):
+        """Dropdown name lists for the add/edit dialogs; these tables change
+        rarely, so cache per table and drop entries on CRUD (via
+        _inv_refresh_all / _upsert_named)."""
+        cache = getattr(self, '_lookup_cache', None)
+        if cache is None:
+            cache = self._lookup_cache = {}
+        names = cache.get(table)
+        if names is None:
+            names = cache[table] = [n for (n,) in self.db.query(
+                f'SELECT name FROM {table} ORDER BY name;', raw=True)]
+        return names
+
+    def _name_suggestions(self, table, term):
+        """Autocomplete matches from the memoized name list — substring scan
+        in Python beats a leading-wildcard LIKE that SQLite can't index."""
+        term = (term or '').lower()
+        return [n for n in self._get_names(table) if term in n.lower()][:10]
+
+    def _memo_suggest(self, key, term, fetch):
+        """Per-term cache for the LIKE-based autocomplete lookups on the big
+        tables (products/sales). Keys carry db.write_tick, so any committed
+        write invalidates stale entries without an explicit hook."""
+        cache = getattr(self, '_sugg_cache', None)
+        if cache is None:
+            cache = self._sugg_cache = {}
+        k = (key, term.lower(), self.db.write_tick)
+        hit = cache.get(k)
+        if hit is None:
+            if len(cache) >= 256:
+                cache.clear()
+            hit = cache[k] = fetch()
+        return hit
+
     def _inv_add_product(self, is_medical=1):
-        cats = [r['name'] for r in self.db.query('SELECT name FROM categories ORDER BY name;')]
-        mans = [r['name'] for r in self.db.query('SELECT name FROM manufacturers ORDER BY name;')]
-        forms = [r['name'] for r in self.db.query('SELECT name FROM formulas ORDER BY name;')]
+        cats = self._get_names('categories')
+        mans = self._get_names('manufacturers')
+        forms = self._get_names('formulas')
         units = ['mg','ml','g','IU','tablet','capsule','bottle','strip','box']
 
         def save(d):
             if not d.get('name'):
                 return messagebox.showerror('Error','Name required')
-            cid = mid = fid = None
-            if d.get('category'):
-                row = self.db.query('SELECT id FROM categories WHERE name=?;',(d['category'],))
-                if row: cid = row[0]['id']
-                else: cid = self.db.execute('INSERT INTO categories(name) VALUES(?);',(d['category'],))
-            if d.get('manufacturer'):
-                row = self.db.query('SELECT id FROM manufacturers WHERE name=?;',(d['manufacturer'],))
-                if row: mid = row[0]['id']
-                else: mid = self.db.execute('INSERT INTO manufacturers(name) VALUES(?);',(d['manufacturer'],))
-            if d.get('formula'):
-                row = self.db.query('SELECT id FROM formulas WHERE name=?;',(d['formula'],))
-                if row: fid = row[0]['id']
-                else: fid = self.db.execute('INSERT INTO formulas(name) VALUES(?);',(d['formula'],))
             try:
-                self.db.execute('INSERT INTO products(name,sku,is_medical,category_id,manufacturer_id,formula_id,unit,sale_price,notes) VALUES(?,?,?,?,?,?,?,?,?);',
+                # one transaction per submit: the lookup upserts and the
+                # product insert share a single commit/fsync
+                with self.db.transaction() as cur:
+                    cid = self._upsert_named('categories', d.get('category'), cur)
+                    mid = self._upsert_named('manufacturers', d.get('manufacturer'), cur)
+                    fid = self._upsert_named('formulas', d.get('formula'), cur)
+                    cur.execute('INSERT INTO products(name,sku,is_medical,category_id,manufacturer_id,formula_id,unit,sale_price,notes) VALUES(?,?,?,?,?,?,?,?,?);',
                                 (d.get('name'), d.get('sku') or None, 1 if is_medical else 0, cid, mid, fid, d.get('unit') or '', float(d.get('price') or 0), d.get('notes') or ''))
                 messagebox.showinfo('Saved','Product added'); self._inv_refresh_all()
             except Exception as e:
@@ -2204,34 +2618,24 @@ class App:
     def _inv_edit_product(self, tree):
         sel = tree.selection()
         if not sel: return messagebox.showwarning('Select','Select a product to edit')
-        values = tree.item(sel[0], 'values')
-        pid = int(values[0])
+        pid = int(sel[0])
         row = self.db.query('SELECT p.*, c.name as category_name, m.name as manufacturer_name, f.name as formula_name FROM products p LEFT JOIN categories c ON p.category_id=c.id LEFT JOIN manufacturers m ON p.manufacturer_id=m.id LEFT JOIN formulas f ON p.formula_id=f.id WHERE p.id=?;',(pid,))
         if not row: return messagebox.showerror('Error','Not found')
         row = row[0]
-        initial = {'name':row['name'],'sku':row['sku'] or '','unit':row['unit'] or '','category':row.get('category_name') or '','manufacturer':row.get('manufacturer_name') or '','formula':row.get('formula_name') or '','price':row['sale_price'],'notes':row['notes']}
+        initial = {'name':row['name'],'sku':row['sku'] or '','unit':row['unit'] or '','category':row['category_name'] or '','manufacturer':row['manufacturer_name'] or '','formula':row['formula_name'] or '','price':row['sale_price'],'notes':row['notes']}
         
-        cats = [r['name'] for r in self.db.query('SELECT name FROM categories ORDER BY name;')]
-        mans = [r['name'] for r in self.db.query('SELECT name FROM manufacturers ORDER BY name;')]
-        forms = [r['name'] for r in self.db.query('SELECT name FROM formulas ORDER BY name;')]
+        cats = self._get_names('categories')
+        mans = self._get_names('manufacturers')
+        forms = self._get_names('formulas')
         units = ['mg','ml','g','IU','tablet','capsule','bottle','strip','box']
 
         def save(d):
-            cid = mid = fid = None
-            if d.get('category'):
-                r = self.db.query('SELECT id FROM categories WHERE name=?;',(d['category'],))
-                if r: cid = r[0]['id']
-                else: cid = self.db.execute('INSERT INTO categories(name) VALUES(?);',(d['category'],))
-            if d.get('manufacturer'):
-                r = self.db.query('SELECT id FROM manufacturers WHERE name=?;',(d['manufacturer'],))
-                if r: mid = r[0]['id']
-                else: mid = self.db.execute('INSERT INTO manufacturers(name) VALUES(?);',(d['manufacturer'],))
-            if d.get('formula'):
-                r = self.db.query('SELECT id FROM formulas WHERE name=?;',(d['formula'],))
-                if r: fid = r[0]['id']
-                else: fid = self.db.execute('INSERT INTO formulas(name) VALUES(?);',(d['formula'],))
             try:
-                self.db.execute('UPDATE products SET name=?,sku=?,category_id=?,manufacturer_id=?,formula_id=?,unit=?,sale_price=?,notes=? WHERE id=?;',
+                with self.db.transaction() as cur:
+                    cid = self._upsert_named('categories', d.get('category'), cur)
+                    mid = self._upsert_named('manufacturers', d.get('manufacturer'), cur)
+                    fid = self._upsert_named('formulas', d.get('formula'), cur)
+                    cur.execute('UPDATE products SET name=?,sku=?,category_id=?,manufacturer_id=?,formula_id=?,unit=?,sale_price=?,notes=? WHERE id=?;',
                                 (d.get('name'), d.get('sku') or None, cid, mid, fid, d.get('unit') or '', float(d.get('price') or 0), d.get('notes') or '', pid))
                 messagebox.showinfo('Saved','Product updated'); self._inv_refresh_all()
             except Exception as e:
@@ -2260,8 +2664,7 @@ class App:
     def _inv_delete_product(self, tree):
         sel = tree.selection()
         if not sel: return messagebox.showwarning('Select','Select a product to delete')
-        values = tree.item(sel[0], 'values')
-        pid = int(values[0])
+        pid = int(sel[0])
         if not messagebox.askyesno('Confirm','Delete selected product?'): return
         try:
             self.db.execute('DELETE FROM products WHERE id=?;',(pid,))
@@ -2275,31 +2678,29 @@ class App:
             if not d.get('name'): return messagebox.showerror('Error','Name required')
             try:
                 self.db.execute('INSERT INTO suppliers(name,phone,email,address) VALUES(?,?,?,?);',(d.get('name'), d.get('phone'), d.get('email'), d.get('address')))
-                messagebox.showinfo('Saved','Supplier added'); self._inv_refresh_all()
+                messagebox.showinfo('Saved','Supplier added'); self._inv_refresh_only('sup','batch')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Add Supplier', [{'key':'name','label':'Name'},{'key':'phone','label':'Phone'},{'key':'email','label':'Email'},{'key':'address','label':'Address'}], on_submit=save)
 
     def _edit_supplier(self):
         sel = self._sup_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select supplier to edit')
-        values = self._sup_tree.item(sel[0], 'values')
-        sid = int(values[0]); r = self.db.query('SELECT * FROM suppliers WHERE id=?;',(sid,))[0]
+        sid = int(sel[0]); r = self.db.query_one('SELECT name,phone,email,address FROM suppliers WHERE id=?;',(sid,))
         initial = {'name':r['name'],'phone':r['phone'],'email':r['email'],'address':r['address']}
         def save(d):
             try:
                 self.db.execute('UPDATE suppliers SET name=?,phone=?,email=?,address=? WHERE id=?;',(d.get('name'),d.get('phone'),d.get('email'),d.get('address'),sid))
-                messagebox.showinfo('Saved','Supplier updated'); self._inv_refresh_all()
+                messagebox.showinfo('Saved','Supplier updated'); self._inv_refresh_only('sup','batch')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Edit Supplier', [{'key':'name','label':'Name'},{'key':'phone','label':'Phone'},{'key':'email','label':'Email'},{'key':'address','label':'Address'}], initial=initial, on_submit=save)
 
     def _delete_supplier(self):
         sel = self._sup_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select supplier to delete')
-        values = self._sup_tree.item(sel[0], 'values')
-        sid = int(values[0])
+        sid = int(sel[0])
         if not messagebox.askyesno('Confirm','Delete supplier?'): return
         try:
-            self.db.execute('DELETE FROM suppliers WHERE id=?;',(sid,)); messagebox.showinfo('Deleted','Supplier deleted'); self._inv_refresh_all()
+            self.db.execute('DELETE FROM suppliers WHERE id=?;',(sid,)); messagebox.showinfo('Deleted','Supplier deleted'); self._inv_refresh_only('sup','batch')
         except Exception as e: messagebox.showerror('Error',str(e))
 
     # Manufacturers CRUD
@@ -2308,31 +2709,29 @@ class App:
             if not d.get('name'): return messagebox.showerror('Error','Name required')
             try:
                 self.db.execute('INSERT INTO manufacturers(name,contact,notes) VALUES(?,?,?);',(d.get('name'),d.get('contact'),d.get('notes')))
-                messagebox.showinfo('Saved','Manufacturer added'); self._inv_refresh_all()
+                messagebox.showinfo('Saved','Manufacturer added'); self._inv_refresh_only('man','med','nonmed')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Add Manufacturer', [{'key':'name','label':'Name'},{'key':'contact','label':'Contact'},{'key':'notes','label':'Notes','widget':'text'}], on_submit=save)
 
     def _edit_manufacturer(self):
         sel = self._man_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select manufacturer to edit')
-        values = self._man_tree.item(sel[0], 'values')
-        mid = int(values[0]); r = self.db.query('SELECT * FROM manufacturers WHERE id=?;',(mid,))[0]
+        mid = int(sel[0]); r = self.db.query_one('SELECT name,contact,notes FROM manufacturers WHERE id=?;',(mid,))
         initial = {'name':r['name'],'contact':r['contact'],'notes':r['notes']}
         def save(d):
             try:
                 self.db.execute('UPDATE manufacturers SET name=?,contact=?,notes=? WHERE id=?;',(d.get('name'),d.get('contact'),d.get('notes'),mid))
-                messagebox.showinfo('Saved','Manufacturer updated'); self._inv_refresh_all()
+                messagebox.showinfo('Saved','Manufacturer updated'); self._inv_refresh_only('man','med','nonmed')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Edit Manufacturer', [{'key':'name','label':'Name'},{'key':'contact','label':'Contact'},{'key':'notes','label':'Notes','widget':'text'}], initial=initial, on_submit=save)
 
     def _delete_manufacturer(self):
         sel = self._man_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select manufacturer to delete')
-        values = self._man_tree.item(sel[0], 'values')
-        mid = int(values[0])
+        mid = int(sel[0])
         if not messagebox.askyesno('Confirm','Delete manufacturer?'): return
         try:
-            self.db.execute('DELETE FROM manufacturers WHERE id=?;',(mid,)); messagebox.showinfo('Deleted','Manufacturer deleted'); self._inv_refresh_all()
+            self.db.execute('DELETE FROM manufacturers WHERE id=?;',(mid,)); messagebox.showinfo('Deleted','Manufacturer deleted'); self._inv_refresh_only('man','med','nonmed')
         except Exception as e: messagebox.showerror('Error',str(e))
 
     # Categories CRUD
@@ -2340,30 +2739,28 @@ class App:
         def save(d):
             if not d.get('name'): return messagebox.showerror('Error','Name required')
             try:
-                self.db.execute('INSERT INTO categories(name,notes) VALUES(?,?);',(d.get('name'), d.get('notes'))); messagebox.showinfo('Saved','Category added'); self._inv_refresh_all()
+                self.db.execute('INSERT INTO categories(name,notes) VALUES(?,?);',(d.get('name'), d.get('notes'))); messagebox.showinfo('Saved','Category added'); self._inv_refresh_only('cat','med','nonmed')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Add Category', [{'key':'name','label':'Name'},{'key':'notes','label':'Notes','widget':'text'}], on_submit=save)
 
     def _edit_category(self):
         sel = self._cat_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select category to edit')
-        values = self._cat_tree.item(sel[0], 'values')
-        cid = int(values[0]); r = self.db.query('SELECT * FROM categories WHERE id=?;',(cid,))[0]
+        cid = int(sel[0]); r = self.db.query_one('SELECT name,notes FROM categories WHERE id=?;',(cid,))
         initial = {'name':r['name'],'notes':r['notes']}
         def save(d):
             try:
-                self.db.execute('UPDATE categories SET name=?,notes=? WHERE id=?;',(d.get('name'),d.get('notes'),cid)); messagebox.showinfo('Saved','Category updated'); self._inv_refresh_all()
+                self.db.execute('UPDATE categories SET name=?,notes=? WHERE id=?;',(d.get('name'),d.get('notes'),cid)); messagebox.showinfo('Saved','Category updated'); self._inv_refresh_only('cat','med','nonmed')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Edit Category', [{'key':'name','label':'Name'},{'key':'notes','label':'Notes','widget':'text'}], initial=initial, on_submit=save)
 
     def _delete_category(self):
         sel = self._cat_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select category to delete')
-        values = self._cat_tree.item(sel[0], 'values')
-        cid = int(values[0])
+        cid = int(sel[0])
         if not messagebox.askyesno('Confirm','Delete category?'): return
         try:
-            self.db.execute('DELETE FROM categories WHERE id=?;',(cid,)); messagebox.showinfo('Deleted','Category deleted'); self._inv_refresh_all()
+            self.db.execute('DELETE FROM categories WHERE id=?;',(cid,)); messagebox.showinfo('Deleted','Category deleted'); self._inv_refresh_only('cat','med','nonmed')
         except Exception as e: messagebox.showerror('Error',str(e))
 
     # Formulas CRUD
@@ -2371,81 +2768,90 @@ class App:
         def save(d):
             if not d.get('name'): return messagebox.showerror('Error','Name required')
             try:
-                self.db.execute('INSERT INTO formulas(name,composition) VALUES(?,?);',(d.get('name'),d.get('composition'))); messagebox.showinfo('Saved','Formula added'); self._inv_refresh_all()
+                self.db.execute('INSERT INTO formulas(name,composition) VALUES(?,?);',(d.get('name'),d.get('composition'))); messagebox.showinfo('Saved','Formula added'); self._inv_refresh_only('form')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Add Formula', [{'key':'name','label':'Name'},{'key':'composition','label':'Composition','widget':'text'}], on_submit=save)
 
     def _edit_formula(self):
         sel = self._form_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select formula to edit')
-        values = self._form_tree.item(sel[0], 'values')
-        fid = int(values[0]); r = self.db.query('SELECT * FROM formulas WHERE id=?;',(fid,))[0]
+        fid = int(sel[0]); r = self.db.query_one('SELECT name,composition FROM formulas WHERE id=?;',(fid,))
         initial = {'name':r['name'],'composition':r['composition']}
         def save(d):
             try:
-                self.db.execute('UPDATE formulas SET name=?,composition=? WHERE id=?;',(d.get('name'),d.get('composition'),fid)); messagebox.showinfo('Saved','Formula updated'); self._inv_refresh_all()
+                self.db.execute('UPDATE formulas SET name=?,composition=? WHERE id=?;',(d.get('name'),d.get('composition'),fid)); messagebox.showinfo('Saved','Formula updated'); self._inv_refresh_only('form')
             except Exception as e: messagebox.showerror('Error',str(e))
         FormDialog(self.root, 'Edit Formula', [{'key':'name','label':'Name'},{'key':'composition','label':'Composition','widget':'text'}], initial=initial, on_submit=save)
 
     def _delete_formula(self):
         sel = self._form_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select formula to delete')
-        values = self._form_tree.item(sel[0], 'values')
-        fid = int(values[0])
+        fid = int(sel[0])
         if not messagebox.askyesno('Confirm','Delete formula?'): return
         try:
-            self.db.execute('DELETE FROM formulas WHERE id=?;',(fid,)); messagebox.showinfo('Deleted','Formula deleted'); self._inv_refresh_all()
+            self.db.execute('DELETE FROM formulas WHERE id=?;',(fid,)); messagebox.showinfo('Deleted','Formula deleted'); self._inv_refresh_only('form')
         except Exception as e: messagebox.showerror('Error',str(e))
 
 
     def make_searchable(self, cb_widget, original_values):
-        def on_keyrelease(event):
-            typed = cb_widget.get()
+        # prefix matches come from a sorted lowercase index with bisect —
+        # O(log N) per keystroke instead of re-lowering the whole list; the
+        # index lives on the widget so a rebind doesn't recompute it
+        index = getattr(cb_widget, '_search_index', None)
+        if index is None or index[2] is not original_values:
+            lowered = sorted((v.lower(), v) for v in original_values)
+            keys = [k for k, _ in lowered]
+            index = cb_widget._search_index = (keys, lowered, original_values)
+        keys, lowered, _ = index
+
+        def do_filter():
+            cb_widget._deb = None
+            typed = cb_widget.get().lower()
             if typed == '':
                 cb_widget['values'] = original_values  # show all if empty
             else:
-                # Only items starting with typed string (case-insensitive)
-                filtered = [v for v in original_values if v.lower().startswith(typed.lower())]
-                cb_widget['values'] = filtered
+                lo = bisect.bisect_left(keys, typed)
+                hi = bisect.bisect_left(keys, typed + '\uffff')
+                cb_widget['values'] = [v for _, v in lowered[lo:hi]]
             if cb_widget['values']:
                 cb_widget.event_generate('<Down>')  # open dropdown automatically
 
+        def on_keyrelease(event):
+            # debounce: one filter pass per typing burst, not per keystroke
+            if getattr(cb_widget, '_deb', None):
+                cb_widget.after_cancel(cb_widget._deb)
+            cb_widget._deb = cb_widget.after(60, do_filter)
+
         cb_widget.bind('<KeyRelease>', on_keyrelease)
 
 
     def _add_batch(self):
         # Fetch data from database
-        products = [r['name'] for r in self.db.query('SELECT name FROM products ORDER BY name;')]
-        suppliers = [r['name'] for r in self.db.query('SELECT name FROM suppliers ORDER BY name;')]
-        manufacturers = [r['name'] for r in self.db.query('SELECT name FROM manufacturers ORDER BY name;')]
+        products = self._get_names('products')
+        suppliers = self._get_names('suppliers')
+        manufacturers = self._get_names('manufacturers')
 
         # Function to save batch
         def save(d):
-            pid = sid = mid = None
-
-            p = self.db.query('SELECT id FROM products WHERE name=?;', (d.get('product'),))
-            if p: pid = p[0]['id']
-
-            if d.get('supplier'):
-                s = self.db.query('SELECT id FROM suppliers WHERE name=?;', (d.get('supplier'),))
-                if s: sid = s[0]['id']
-
-            if d.get('manufacturer'):
-                m = self.db.query('SELECT id FROM manufacturers WHERE name=?;', (d.get('manufacturer'),))
-                if m: mid = m[0]['id']
+            # single-value lookup: fetchone on a raw cursor, no Row wrapping
+            p = self.db.query_one('SELECT id FROM products WHERE name=?;', (d.get('product'),), raw=True)
+            pid = p[0] if p else None
 
             if not pid:
                 return messagebox.showerror('Error', 'Product is required and must exist.')
 
             try:
-                self.db.execute(
-                    'INSERT INTO batches(product_id, supplier_id, manufacturer_id, batch_no, quantity, expiry_date, cost_price, created_at) '
-                    'VALUES(?,?,?,?,?,?,?,?);',
-                    (pid, sid, mid, d.get('batch_no') or '', int(d.get('quantity') or 0),
-                    d.get('expiry') or None, float(d.get('cost_price') or 0), now_str())
-                )
+                with self.db.transaction() as cur:
+                    sid = self._upsert_named('suppliers', d.get('supplier'), cur)
+                    mid = self._upsert_named('manufacturers', d.get('manufacturer'), cur)
+                    cur.execute(
+                        'INSERT INTO batches(product_id, supplier_id, manufacturer_id, batch_no, quantity, expiry_date, cost_price, created_at) '
+                        'VALUES(?,?,?,?,?,?,?,?);',
+                        (pid, sid, mid, d.get('batch_no') or '', int(d.get('quantity') or 0),
+                        d.get('expiry') or None, float(d.get('cost_price') or 0), now_str())
+                    )
                 messagebox.showinfo('Saved', 'Batch added successfully.')
-                self._inv_refresh_all()
+                self._inv_refresh_only('batch', 'med', 'nonmed')
             except Exception as e:
                 messagebox.showerror('Error', str(e))
 
@@ -2472,21 +2878,18 @@ class App:
     def _edit_batch(self):
         sel = self._batch_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select batch to edit')
-        values = self._batch_tree.item(sel[0], 'values')
-        bid = int(values[0]); r = self.db.query('SELECT * FROM batches WHERE id=?;',(bid,))[0]
-        prodname = self.db.query('SELECT name FROM products WHERE id=?;',(r['product_id'],))[0]['name']
-        supname = None
-        if r['supplier_id']:
-            s = self.db.query('SELECT name FROM suppliers WHERE id=?;',(r['supplier_id'],))
-            supname = s[0]['name'] if s else None
-        
-        # Get manufacturer name
-        manname = None
-        if r['product_id']:
-            m = self.db.query('SELECT m.name FROM products p LEFT JOIN manufacturers m ON m.id=p.manufacturer_id WHERE p.id=?;',(r['product_id'],))
-            manname = m[0]['name'] if m and m[0]['name'] else None
-        
-        initial = {'product':prodname,'supplier':supname,'manufacturer':manname,'batch_no':r['batch_no'],'quantity':r['quantity'],'expiry':r['expiry_date'],'cost_price':r['cost_price']}
+        bid = int(sel[0])
+        # batch, product, supplier and manufacturer names in one JOIN instead
+        # of four round-trips before the dialog opens
+        r = self.db.query_one(
+            'SELECT b.*, p.name AS product_name, s.name AS supplier_name, m.name AS manufacturer_name '
+            'FROM batches b LEFT JOIN products p ON p.id=b.product_id '
+            'LEFT JOIN suppliers s ON s.id=b.supplier_id '
+            'LEFT JOIN manufacturers m ON m.id=p.manufacturer_id WHERE b.id=?;', (bid,))
+        if not r:
+            return messagebox.showerror('Error', 'Batch not found')
+
+        initial = {'product':r['product_name'],'supplier':r['supplier_name'],'manufacturer':r['manufacturer_name'],'batch_no':r['batch_no'],'quantity':r['quantity'],'expiry':r['expiry_date'],'cost_price':r['cost_price']}
         
         def save(d):
             p = self.db.query('SELECT id FROM products WHERE name=?;',(d.get('product'),))
@@ -2506,7 +2909,7 @@ class App:
             try:
                 self.db.execute('UPDATE batches SET product_id=?,supplier_id=?,batch_no=?,quantity=?,expiry_date=?,cost_price=? WHERE id=?;',
                                 (pid, sid, d.get('batch_no') or '', int(d.get('quantity') or 0), d.get('expiry') or None, float(d.get('cost_price') or 0), bid))
-                messagebox.showinfo('Saved','Batch updated'); self._inv_refresh_all()
+                messagebox.showinfo('Saved','Batch updated'); self._inv_refresh_only('batch','med','nonmed')
             except Exception as e: messagebox.showerror('Error',str(e))
         
         fields = [
@@ -2521,38 +2924,29 @@ class App:
         
         dlg = FormDialog(self.root, 'Edit Batch', fields, initial=initial, on_submit=save)
         
-        # Add autocomplete functionality after creating the widgets
-        if 'product' in dlg.widgets:
-            product_entry = dlg.widgets['product'][0]
-            product_entry.suggestions_getter = lambda term: [r['name'] for r in self.db.query(
-                "SELECT name FROM products WHERE name LIKE ? ORDER BY name LIMIT 10", (f"%{term}%",))]
-        
-        if 'supplier' in dlg.widgets:
-            supplier_entry = dlg.widgets['supplier'][0]
-            supplier_entry.suggestions_getter = lambda term: [r['name'] for r in self.db.query(
-                "SELECT name FROM suppliers WHERE name LIKE ? ORDER BY name LIMIT 10", (f"%{term}%",))]
-        
-        if 'manufacturer' in dlg.widgets:
-            manufacturer_entry = dlg.widgets['manufacturer'][0]
-            manufacturer_entry.suggestions_getter = lambda term: [r['name'] for r in self.db.query(
-                "SELECT name FROM manufacturers WHERE name LIKE ? ORDER BY name LIMIT 10", (f"%{term}%",))]
+        # Add autocomplete functionality after creating the widgets; matches
+        # come from the memoized name lists, not a LIKE '%term%' table scan
+        # per keystroke
+        for key, table in (('product', 'products'),
+                           ('supplier', 'suppliers'),
+                           ('manufacturer', 'manufacturers')):
+            if key in dlg.widgets:
+                dlg.widgets[key][0].suggestions_getter = \
+                    lambda term, t=table: self._name_suggestions(t, term)
         
         # Add functionality to auto-fill manufacturer when product is selected
+        # product → manufacturer mapping built once per dialog open; each
+        # FocusOut/Return is then a dict hit instead of a JOIN query
+        prod_to_man = dict(self.db.query(
+            'SELECT p.name, m.name FROM products p '
+            'LEFT JOIN manufacturers m ON m.id=p.manufacturer_id;', raw=True))
+
         def on_product_select(event=None):
-            product_name = dlg.widgets['product'][0].get().strip()
-            if product_name:
-                # Get manufacturer for this product
-                result = self.db.query('''
-                    SELECT m.name 
-                    FROM products p 
-                    LEFT JOIN manufacturers m ON p.manufacturer_id = m.id 
-                    WHERE p.name = ? LIMIT 1
-                ''', (product_name,))
-                
-                if result and result[0]['name']:
-                    dlg.widgets['manufacturer'][0].delete(0, 'end')
-                    dlg.widgets['manufacturer'][0].insert(0, result[0]['name'])
-        
+            mn = prod_to_man.get(dlg.widgets['product'][0].get().strip())
+            if mn:
+                dlg.widgets['manufacturer'][0].delete(0, 'end')
+                dlg.widgets['manufacturer'][0].insert(0, mn)
+
         # Bind the product entry to auto-fill manufacturer
         dlg.widgets['product'][0].bind('<FocusOut>', on_product_select)
         dlg.widgets['product'][0].bind('<Return>', on_product_select)
@@ -2560,11 +2954,10 @@ class App:
     def _delete_batch(self):
         sel = self._batch_tree.selection()
         if not sel: return messagebox.showwarning('Select','Select batch to delete')
-        values = self._batch_tree.item(sel[0], 'values')
-        bid = int(values[0])
+        bid = int(sel[0])
         if not messagebox.askyesno('Confirm','Delete batch?'): return
         try:
-            self.db.execute('DELETE FROM batches WHERE id=?;',(bid,)); messagebox.showinfo('Deleted','Batch deleted'); self._inv_refresh_all()
+            self.db.execute('DELETE FROM batches WHERE id=?;',(bid,)); messagebox.showinfo('Deleted','Batch deleted'); self._inv_refresh_only('batch','med','nonmed')
         except Exception as e: messagebox.showerror('Error',str(e))
 
      # ---------------- POS with nested tabs ----------------
@@ -2580,17 +2973,53 @@ class App:
         pos_nb.add(new_sale_tab, text='New Sale')
         NewSaleTab(new_sale_tab, self.db, self.user).pack(fill='both', expand=True)
 
-        # --- Sale History ---
+        # the remaining sub-tabs get empty frames now and their widgets +
+        # initial queries on first visit (New Sale stays eager — it is the
+        # tab cashiers land on)
         history_tab = ttk.Frame(pos_nb)
         pos_nb.add(history_tab, text='Sale History')
+        return_item_tab = ttk.Frame(pos_nb)
+        pos_nb.add(return_item_tab, text='Return Item')
+        returns_tab = ttk.Frame(pos_nb)
+        pos_nb.add(returns_tab, text='Return History')
+        reports_tab = ttk.Frame(pos_nb)
+        pos_nb.add(reports_tab, text='Sale Reports')
+
+        builders = {
+            'Sale History': lambda: self._build_sale_history_in(history_tab),
+            'Return Item': lambda: self._build_return_item_tab(return_item_tab),
+            'Return History': lambda: self._build_return_history_in(returns_tab),
+            'Sale Reports': lambda: self._build_reports_tab_safe(reports_tab),
+        }
+
+        def on_pos_tab_changed(event=None):
+            builder = builders.pop(pos_nb.tab(pos_nb.select(), 'text'), None)
+            if builder:
+                builder()
+        pos_nb.bind('<<NotebookTabChanged>>', on_pos_tab_changed)
+
+    # column sets for the POS history trees (uniform 120px, left-aligned)
+    _SALE_HISTORY_COLS = ('sale_id', 'date', 'customer', 'product', 'qty', 'price',
+                          'expiry', 'supplier', 'manufacturer', 'subtotal')
+    _RETURN_HISTORY_COLS = ('id', 'sale_item', 'product', 'qty', 'reason', 'created', 'expiry')
+
+    @staticmethod
+    def _config_columns(tree, cols, width=120, anchor='w'):
+        """Configure headings/columns with direct tk.call — skips the ttk
+        option-parsing wrapper per column on the tab-build path."""
+        call = tree.tk.call
+        w = tree._w
+        for c in cols:
+            call(w, 'heading', c, '-text', c.capitalize())
+            call(w, 'column', c, '-width', width, '-anchor', anchor)
+
+    def _build_sale_history_in(self, history_tab):
         self._sale_history_tree = ttk.Treeview(
             history_tab,
-            columns=('sale_id','date','customer','product','qty','price','expiry','supplier','manufacturer','subtotal'),
+            columns=self._SALE_HISTORY_COLS,
             show='headings', height=18
         )
-        for c in ('sale_id','date','customer','product','qty','price','expiry','supplier','manufacturer','subtotal'):
-            self._sale_history_tree.heading(c, text=c.capitalize())
-            self._sale_history_tree.column(c, width=120, anchor='w')
+        self._config_columns(self._sale_history_tree, self._SALE_HISTORY_COLS)
         self._sale_history_tree.pack(fill='both', expand=True, padx=8, pady=8)
         btns = ttk.Frame(history_tab)
         btns.pack(fill='x')
@@ -2600,22 +3029,14 @@ class App:
             self._sale_history_refresh()
         except Exception:
             pass
-        # --- Return Item ---
-        return_item_tab = ttk.Frame(pos_nb)
-        pos_nb.add(return_item_tab, text='Return Item')
-        self._build_return_item_tab(return_item_tab)
 
-        # --- Return History ---
-        returns_tab = ttk.Frame(pos_nb)
-        pos_nb.add(returns_tab, text='Return History')
+    def _build_return_history_in(self, returns_tab):
         self._return_tree = ttk.Treeview(
             returns_tab,
-            columns=('id','sale_item','product','qty','reason','created','expiry'),
+            columns=self._RETURN_HISTORY_COLS,
             show='headings'
         )
-        for c in ('id','sale_item','product','qty','reason','created','expiry'):
-            self._return_tree.heading(c, text=c.capitalize())
-            self._return_tree.column(c, width=120, anchor='w')
+        self._config_columns(self._return_tree, self._RETURN_HISTORY_COLS)
         self._return_tree.pack(fill='both', expand=True, padx=8, pady=8)
         ttk.Button(returns_tab, text='Refresh', command=self._return_refresh).pack(anchor='e', padx=8, pady=6)
         try:
@@ -2623,9 +3044,7 @@ class App:
         except Exception:
             pass
 
-        # --- Sale Reports ---
-        reports_tab = ttk.Frame(pos_nb)
-        pos_nb.add(reports_tab, text='Sale Reports')
+    def _build_reports_tab_safe(self, reports_tab):
         try:
             # Use the fixed reports implementation
             self._build_reports_in_frame(reports_tab)
@@ -2654,9 +3073,7 @@ class App:
             columns=("id", "product", "qty", "price", "total"),
             show="headings"
         )
-        for col in ("id", "product", "qty", "price", "total"):
-            self.return_tree.heading(col, text=col.capitalize())
-            self.return_tree.column(col, width=120, anchor="w")
+        self._config_columns(self.return_tree, ("id", "product", "qty", "price", "total"))
         self.return_tree.pack(fill="both", expand=True, padx=10, pady=6)
 
         # --- Return controls ---
@@ -2701,37 +3118,37 @@ class App:
             messagebox.showerror("Error", "Invalid return quantity.")
             return
 
-        # 1. Log the return
-        self.db.execute("""
-            INSERT INTO returns (sale_item_id, quantity, reason)
-            VALUES (?, ?, ?)
-        """, (item_id, return_qty, reason))
-
-        # 2. Restore stock to batches used in this sale
+        # figure out how much goes back to each batch up front, then run the
+        # whole return (log + restores + sale_item adjust) as one commit
         batches = self.db.query("""
             SELECT sib.batch_id, sib.quantity
             FROM sale_item_batches sib
             WHERE sib.sale_item_id = ?
             ORDER BY sib.id ASC;
-        """, (item_id,))
+        """, (item_id,), raw=True)
 
+        restores = []
         remain = return_qty
-        for b in batches:
+        for batch_id, sold_qty in batches:
             if remain <= 0:
                 break
-            give_back = min(remain, b["quantity"])
-            self.db.execute(
-                "UPDATE batches SET quantity = quantity + ? WHERE id = ?;",
-                (give_back, b["batch_id"])
-            )
+            give_back = min(remain, sold_qty)
+            restores.append((give_back, batch_id))
             remain -= give_back
 
-        # 3. Update sale_items to reflect reduced sold qty
-        self.db.execute("""
-            UPDATE sale_items
-            SET quantity = quantity - ?
-            WHERE id = ?
-        """, (return_qty, item_id))
+        with self.db.transaction() as cur:
+            cur.execute("""
+                INSERT INTO returns (sale_item_id, quantity, reason)
+                VALUES (?, ?, ?)
+            """, (item_id, return_qty, reason))
+            cur.executemany(
+                "UPDATE batches SET quantity = quantity + ? WHERE id = ?;",
+                restores)
+            cur.execute("""
+                UPDATE sale_items
+                SET quantity = quantity - ?
+                WHERE id = ?
+            """, (return_qty, item_id))
 
         messagebox.showinfo("Success", f"Returned {return_qty} x {product}")
         # Refresh items for this sale
@@ -2741,42 +3158,68 @@ class App:
         # kept for backward compatibility (not used as top-level)
         pass
 
+    # rows inserted per page while scrolling the sale history
+    _HISTORY_PAGE = 200
+
     def _sale_history_refresh(self):
         tree = getattr(self, '_sale_history_tree', None)
         if not tree:
             return
-        
+
+        # nothing was written since the last load, so the tree is current
+        if (getattr(self, '_sale_history_tick', None) == self.db.write_tick
+                and tree.get_children()):
+            return
+        self._sale_history_tick = self.db.write_tick
+
         tree.delete(*tree.get_children())
-        
-        # Simplified query that doesn't rely on sale_item_batches
+        self._sale_history_offset = 0
+        self._sale_history_done = False
+        # history is unbounded, so rows stream in one page at a time as the
+        # user nears the bottom instead of inserting every sale up front
+        if not getattr(tree, '_scroll_bound', False):
+            tree._scroll_bound = True
+            for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>',
+                        '<KeyRelease-Next>', '<KeyRelease-End>'):
+                tree.bind(seq, self._sale_history_maybe_extend, add='+')
+        self._sale_history_load_page()
+
+    def _sale_history_load_page(self):
+        tree = getattr(self, '_sale_history_tree', None)
+        if not tree or self._sale_history_done:
+            return
+        # Simplified query that doesn't rely on sale_item_batches; formatting
+        # happens in SQL (printf, '' placeholders) so rows insert as-is
         rows = self.db.query('''
-            SELECT 
-                s.id AS sale_id, 
-                s.created_at AS date, 
-                s.customer_name AS customer,
-                p.name AS product, 
-                si.quantity AS qty, 
-                si.price AS price,
-                (si.quantity * si.price) AS subtotal
+            SELECT
+                s.id,
+                s.created_at,
+                COALESCE(s.customer_name,''),
+                p.name,
+                si.quantity,
+                printf('%.2f', si.price),
+                '', '', '',
+                printf('%.2f', si.quantity * si.price)
             FROM sales s
             JOIN sale_items si ON si.sale_id = s.id
             JOIN products p ON p.id = si.product_id
-            ORDER BY s.created_at DESC LIMIT 200;
-        ''')
-        
-        for r in rows:
-            tree.insert('', 'end', values=(
-                r['sale_id'], 
-                r['date'], 
-                r['customer'] or '', 
-                r['product'], 
-                r['qty'], 
-                f"{r['price']:.2f}", 
-                "",  # expiry (empty for now)
-                "",  # supplier (empty for now)
-                "",  # manufacturer (empty for now)
-                f"{r['subtotal']:.2f}"
-            ))
+            ORDER BY s.created_at DESC LIMIT ? OFFSET ?;
+        ''', (self._HISTORY_PAGE, self._sale_history_offset), raw=True)
+        self._sale_history_offset += len(rows)
+        if len(rows) < self._HISTORY_PAGE:
+            self._sale_history_done = True
+
+        insert = tree.insert
+        for row in rows:
+            insert('', 'end', values=row)
+
+    def _sale_history_maybe_extend(self, event=None):
+        tree = getattr(self, '_sale_history_tree', None)
+        if not tree or self._sale_history_done:
+            return
+        # near the bottom of the loaded window: fetch the next page
+        if tree.yview()[1] > 0.9:
+            self.root.after_idle(self._sale_history_load_page)
 
     def _sale_history_print_selected(self):
         sel = self._sale_history_tree.selection()
@@ -2790,20 +3233,30 @@ class App:
             messagebox.showwarning('Missing','reportlab required for PDF receipt')
  
     def _print_receipt(self, sale_id):
-        sale = self.db.query('SELECT * FROM sales WHERE id=?;', (sale_id,))
+        sale = self.db.query_one(
+            'SELECT total, customer_name, customer_phone FROM sales WHERE id=? LIMIT 1;',
+            (sale_id,), raw=True)
         if not sale:
             return messagebox.showerror('Error','Sale not found')
-        sale = sale[0]
 
-        total = float(sale['total'])
-        cust_name = sale.get('customer_name') or ""
-        cust_phone = sale.get('customer_phone') or ""
+        total, cust_name, cust_phone = sale
+        total = float(total)
+        cust_name = cust_name or ""
+        cust_phone = cust_phone or ""
 
-        try:
-            self.print_receipt_direct(sale_id, total, cust_name, cust_phone)
-            messagebox.showinfo("Printing", "Receipt sent to printer.")
-        except Exception as e:
-            messagebox.showerror("Print Error", f"Could not print receipt directly:\n{e}")
+        # PDF render + spooling are disk/printer bound; run them on the shared
+        # I/O pool so the history tab stays responsive, and marshal the result
+        # back onto the Tk thread for the messagebox.
+        def work():
+            try:
+                self.print_receipt_direct(sale_id, total, cust_name, cust_phone)
+                self.root.after(0, lambda: messagebox.showinfo(
+                    "Printing", "Receipt sent to printer."))
+            except Exception as e:
+                err = str(e)
+                self.root.after(0, lambda: messagebox.showerror(
+                    "Print Error", f"Could not print receipt directly:\n{err}"))
+        _IO_POOL.submit(work)
 
 
 
@@ -2815,13 +3268,13 @@ class App:
     def _return_refresh(self):
         tree = getattr(self, '_return_tree', None)
         if not tree: return
-        tree.delete(*tree.get_children())
         rows = self.db.query('''SELECT r.id, r.sale_item_id AS sale_item, p.name AS product, r.quantity AS qty, r.reason, r.created_at AS created, b.expiry_date AS expiry
             FROM returns r JOIN sale_items si ON si.id=r.sale_item_id JOIN products p ON p.id=si.product_id
             LEFT JOIN sale_item_batches sib ON sib.sale_item_id=si.id LEFT JOIN batches b ON b.id=sib.batch_id
-            ORDER BY r.id DESC LIMIT 500;''')
-        for r in rows:
-            tree.insert('', 'end', values=(r['id'], r['sale_item'], r['product'], r['qty'], r['reason'], r['created'], r['expiry'] or ''))
+            ORDER BY r.id DESC LIMIT 500;''', raw=True)
+        self._bulk_fill_tree(tree, [
+            (rid, sale_item, product, qty, reason, created, expiry or '')
+            for rid, sale_item, product, qty, reason, created, expiry in rows])
 
    
         # ---------------- Reports ----------------
@@ -2866,16 +3319,12 @@ class App:
         filter_btn.grid(row=2, column=0, columnspan=4, pady=10)
         
         # ---------------- Report Treeview ----------------
-        columns = ('sale_id', 'date', 'customer', 'product', 'quantity', 'price', 'subtotal', 'supplier')
-        tree = ttk.Treeview(frame, columns=columns, show='headings', height=15)
-        
-        col_widths = {
-            'sale_id': 80, 'date': 150, 'customer': 150, 'product': 200,
-            'quantity': 80, 'price': 80, 'subtotal': 100, 'supplier': 150
-        }
-        for col in columns:
-            tree.heading(col, text=col.replace('_', ' ').title())
-            tree.column(col, width=col_widths[col], anchor='center')
+        tree = ttk.Treeview(frame, columns=tuple(k for k, _, _ in self._REPORT_COLS),
+                            show='headings', height=15)
+        call = tree.tk.call
+        for k, label, w in self._REPORT_COLS:
+            call(tree._w, 'heading', k, '-text', label)
+            call(tree._w, 'column', k, '-width', w, '-anchor', 'center')
         
         scrollbar = ttk.Scrollbar(frame, orient='vertical', command=tree.yview)
         tree.configure(yscrollcommand=scrollbar.set)
@@ -2894,50 +3343,143 @@ class App:
         self._report_tree = tree
         self._load_all_sales()
 
+    # windowed rendering for the report tree: the query result stays in a
+    # Python list and rows are only inserted as the user scrolls toward them;
+    # filtered reports additionally fetch from SQLite one LIMIT/OFFSET page
+    # at a time so unbounded joins never land in Python all at once
+    _REPORT_WINDOW = 200
+
+    # (column key, heading label, width) — labels precomputed so tab rebuilds
+    # skip the per-column replace/title string work
+    _REPORT_COLS = (('sale_id', 'Sale Id', 80), ('date', 'Date', 150),
+                    ('customer', 'Customer', 150), ('product', 'Product', 200),
+                    ('quantity', 'Quantity', 80), ('price', 'Price', 80),
+                    ('subtotal', 'Subtotal', 100), ('supplier', 'Supplier', 150))
+
+    def _report_fill(self, values, sql=None, params=()):
+        tree = self._report_tree
+        self._report_rows = list(values)
+        self._report_shown = 0
+        self._report_sql = sql
+        self._report_params = tuple(params)
+        self._report_offset = len(self._report_rows)
+        self._report_done = sql is None or len(self._report_rows) < self._REPORT_WINDOW
+        tree.delete(*tree.get_children())
+        if not getattr(tree, '_scroll_bound', False):
+            tree._scroll_bound = True
+            for seq in ('<MouseWheel>', '<Button-4>', '<Button-5>',
+                        '<KeyRelease-Next>', '<KeyRelease-End>'):
+                tree.bind(seq, self._report_maybe_extend, add='+')
+        self._report_extend()
+
+    def _report_next_page(self):
+        rows = self.db.query(
+            self._report_sql + ' LIMIT ? OFFSET ?',
+            self._report_params + (self._REPORT_WINDOW, self._report_offset),
+            raw=True)
+        self._report_offset += len(rows)
+        if len(rows) < self._REPORT_WINDOW:
+            self._report_done = True
+        self._report_rows.extend(rows)
+
+    def _report_extend(self):
+        tree = self._report_tree
+        start = self._report_shown
+        if start >= len(self._report_rows) and not self._report_done:
+            self._report_next_page()
+        rows = self._report_rows
+        end = min(start + self._REPORT_WINDOW, len(rows))
+        if start >= end:
+            return
+        insert = tree.insert
+        for v in rows[start:end]:
+            insert('', 'end', values=v)
+        self._report_shown = end
+
+    def _report_all_rows(self):
+        # exports need the full result set, not just the pages the tree
+        # has materialized so far
+        while not getattr(self, '_report_done', True):
+            self._report_next_page()
+        return getattr(self, '_report_rows', None) or []
+
+    def _report_maybe_extend(self, event=None):
+        tree = getattr(self, '_report_tree', None)
+        if not tree:
+            return
+        try:
+            if tree.yview()[1] > 0.9:
+                tree.after_idle(self._report_extend)
+        except tk.TclError:
+            pass
+
     def _apply_report_filters(self, from_date, to_date, product_filter, customer_filter, supplier_filter):
         if not hasattr(self, '_report_tree') or self._report_tree is None:
             return
         
+        # supplier comes from a correlated LIMIT 1 subquery rather than three
+        # LEFT JOINs: a sale_item sold from several batches would otherwise
+        # repeat once per batch in the result
         query = '''
-            SELECT s.id AS sale_id, s.created_at AS date, s.customer_name AS customer,
-                p.name AS product, si.quantity AS quantity, si.price AS price,
-                (si.quantity * si.price) AS subtotal, sup.name AS supplier
+            SELECT s.id AS sale_id, s.created_at AS date,
+                COALESCE(s.customer_name, 'N/A') AS customer,
+                p.name AS product, si.quantity AS quantity,
+                printf('%.2f', si.price) AS price,
+                printf('%.2f', si.quantity * si.price) AS subtotal,
+                COALESCE((SELECT sup.name FROM sale_item_batches sib
+                    JOIN batches b ON b.id = sib.batch_id
+                    JOIN suppliers sup ON sup.id = b.supplier_id
+                    WHERE sib.sale_item_id = si.id LIMIT 1), 'N/A') AS supplier
             FROM sales s
             JOIN sale_items si ON si.sale_id = s.id
             JOIN products p ON p.id = si.product_id
-            LEFT JOIN sale_item_batches sib ON sib.sale_item_id = si.id
-            LEFT JOIN batches b ON b.id = sib.batch_id
-            LEFT JOIN suppliers sup ON sup.id = b.supplier_id
             WHERE 1=1
         '''
         params = []
-        if from_date: params += [from_date]; query += " AND date(s.created_at) >= ?"
-        if to_date:   params += [to_date];   query += " AND date(s.created_at) <= ?"
+        # bare created_at comparisons (no date() wrapper) keep the predicate
+        # sargable so idx_sales_created can seek the range
+        if from_date: params += [from_date]; query += " AND s.created_at >= ?"
+        if to_date:   params += [to_date];   query += " AND s.created_at < date(?, '+1 day')"
         if product_filter:  params += [f'%{product_filter}%']; query += " AND p.name LIKE ?"
         if customer_filter: params += [f'%{customer_filter}%']; query += " AND s.customer_name LIKE ?"
-        if supplier_filter: params += [f'%{supplier_filter}%']; query += " AND sup.name LIKE ?"
+        if supplier_filter:
+            params += [f'%{supplier_filter}%']
+            query += (" AND EXISTS (SELECT 1 FROM sale_item_batches sib"
+                      " JOIN batches b ON b.id = sib.batch_id"
+                      " JOIN suppliers sup ON sup.id = b.supplier_id"
+                      " WHERE sib.sale_item_id = si.id AND sup.name LIKE ?)")
         
         query += " ORDER BY s.created_at DESC"
         
-        try:
-            rows = self.db.query(query, tuple(params))
-            self._report_tree.delete(*self._report_tree.get_children())
-            for r in rows:
-                self._report_tree.insert('', 'end', values=(
-                    r['sale_id'], r['date'], r['customer'] or 'N/A',
-                    r['product'], r['quantity'], f"{r['price']:.2f}",
-                    f"{r['subtotal']:.2f}", r['supplier'] or 'N/A'
-                ))
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load report data: {str(e)}")
+        # first page runs on the DB pool so a cold filter query never
+        # freezes the UI; the fill is marshalled back to the Tk thread
+        def work():
+            try:
+                rows = self.db.query(query + ' LIMIT ? OFFSET ?',
+                                     (*params, self._REPORT_WINDOW, 0), raw=True)
+            except Exception as e:
+                err = str(e)
+                self.root.after(0, lambda: messagebox.showerror(
+                    "Error", f"Failed to load report data: {err}"))
+                return
+            self.root.after(0, self._report_fill_safe, rows, query, tuple(params))
+        _DB_POOL.submit(work)
+
+    def _report_fill_safe(self, rows, sql=None, params=()):
+        tree = getattr(self, '_report_tree', None)
+        if not tree or not tree.winfo_exists():
+            return
+        self._report_fill(rows, sql=sql, params=params)
 
     def _product_suggestions(self, term):
             rows = self.db.query('SELECT name FROM products WHERE name LIKE ? ORDER BY name LIMIT 10;', (f'%{term}%',))
             return [r['name'] for r in rows]
 
     def _customer_suggestions(self, term):
-        rows = self.db.query('SELECT DISTINCT customer_name FROM sales WHERE customer_name LIKE ? ORDER BY customer_name LIMIT 10;', (f'%{term}%',))
-        return [r['customer_name'] for r in rows if r['customer_name']]
+        return self._memo_suggest('customer', term, lambda: [
+            n for (n,) in self.db.query(
+                'SELECT DISTINCT customer_name FROM sales WHERE customer_name LIKE ? ORDER BY customer_name LIMIT 10;',
+                (f'%{term}%',), raw=True) if n])
 
     def _supplier_suggestions(self, term):
         rows = self.db.query('SELECT name FROM suppliers WHERE name LIKE ? ORDER BY name LIMIT 10;', (f'%{term}%',))
@@ -2946,33 +3488,36 @@ class App:
     def _load_all_sales(self):
         if not hasattr(self, '_report_tree') or self._report_tree is None:
             return
-        try:
-            rows = self.db.query('''
-                SELECT s.id AS sale_id, s.created_at AS date, s.customer_name AS customer,
-                    p.name AS product, si.quantity AS quantity, si.price AS price,
-                    (si.quantity * si.price) AS subtotal,
-                    sup.name AS supplier
+        def work():
+            try:
+                rows = self.db.query('''
+                SELECT s.id AS sale_id, s.created_at AS date,
+                    COALESCE(s.customer_name, 'N/A') AS customer,
+                    p.name AS product, si.quantity AS quantity,
+                    printf('%.2f', si.price) AS price,
+                    printf('%.2f', si.quantity * si.price) AS subtotal,
+                    COALESCE((SELECT sup.name FROM sale_item_batches sib
+                        JOIN batches b ON b.id = sib.batch_id
+                        JOIN suppliers sup ON sup.id = b.supplier_id
+                        WHERE sib.sale_item_id = si.id LIMIT 1), 'N/A') AS supplier
                 FROM sales s
                 JOIN sale_items si ON si.sale_id = s.id
                 JOIN products p ON p.id = si.product_id
-                LEFT JOIN sale_item_batches sib ON sib.sale_item_id = si.id
-                LEFT JOIN batches b ON b.id = sib.batch_id
-                LEFT JOIN suppliers sup ON sup.id = b.supplier_id
                 ORDER BY s.created_at DESC LIMIT 500
-            ''')
-            self._report_tree.delete(*self._report_tree.get_children())
-            for r in rows:
-                self._report_tree.insert('', 'end', values=(
-                    r['sale_id'], r['date'], r['customer'] or 'N/A',
-                    r['product'], r['quantity'], f"{r['price']:.2f}",
-                    f"{r['subtotal']:.2f}", r['supplier'] or 'N/A'
-                ))
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to load sales data: {str(e)}")
+                ''', raw=True)
+            except Exception as e:
+                err = str(e)
+                self.root.after(0, lambda: messagebox.showerror(
+                    "Error", f"Failed to load sales data: {err}"))
+                return
+            self.root.after(0, self._report_fill_safe, rows)
+        _DB_POOL.submit(work)
 
     def _export_report(self, tree, fmt="csv"):
         try:
-            rows = [tree.item(i, "values") for i in tree.get_children()]
+            # pull the full report, not just the pages the tree has shown
+            rows = self._report_all_rows() or \
+                [tree.item(i, "values") for i in tree.get_children()]
             if not rows:
                 messagebox.showwarning("No Data", "No report data to export.")
                 return
@@ -2990,9 +3535,10 @@ class App:
                     writer.writerows(rows)
             else:
                 import openpyxl
-                wb = openpyxl.Workbook()
-                ws = wb.active
-                ws.title = "Sales Report"
+                # write_only streams rows straight to disk instead of holding
+                # a cell object per value in memory
+                wb = openpyxl.Workbook(write_only=True)
+                ws = wb.create_sheet(title="Sales Report")
                 ws.append(("Sale ID","Date","Customer","Product","Quantity","Price","Subtotal","Supplier"))
                 for r in rows: ws.append(r)
                 wb.save(fpath)
@@ -3087,7 +3633,7 @@ class App:
         def save(d):
             if not d.get('username') or not d.get('password'):
                 return messagebox.showerror('Error','Username and password required')
-            existing = self.db.query("SELECT id FROM users WHERE username=?;", (d['username'],))
+            existing = self.db.query_one("SELECT id FROM users WHERE username=?;", (d['username'],))
             if existing:
                 return messagebox.showerror('Error','Username already exists')
             try:
@@ -3121,27 +3667,22 @@ class App:
         tax_e = ttk.Entry(f, width=8); tax_e.grid(row=2, column=1, padx=4)
         ttk.Label(f, text='Default Discount (%)').grid(row=3, column=0, sticky='w', padx=4, pady=4)
         disc_e = ttk.Entry(f, width=8); disc_e.grid(row=3, column=1, padx=4)
-        def _get(key, default=''):
-            rows = self.db.query('SELECT value FROM settings WHERE key=?;', (key,))
-            return rows[0]['value'] if rows else default
+        # settings already live in the db.settings dict; no per-key SELECTs
+        _get = self.db.settings.get
         name_e.insert(0, _get('pharmacy_name','Pharmacy Receipt'))
         addr_e.insert(0, _get('pharmacy_address','123 Main Street, City'))
         tax_e.insert(0, _get('tax_percent','0'))
         disc_e.insert(0, _get('default_discount','0'))
         def save():
-            self.db.execute('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', ('pharmacy_name', name_e.get().strip()))
-            self.db.execute('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', ('pharmacy_address', addr_e.get().strip()))
-            self.db.execute('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', ('tax_percent', tax_e.get().strip()))
-            self.db.execute('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', ('default_discount', disc_e.get().strip()))
+            self.db.set_settings({
+                'pharmacy_name': name_e.get().strip(),
+                'pharmacy_address': addr_e.get().strip(),
+                'tax_percent': tax_e.get().strip(),
+                'default_discount': disc_e.get().strip(),
+            })
             messagebox.showinfo('Saved','Settings saved')
         ttk.Button(f, text='Save Settings', command=save).grid(row=4, column=0, columnspan=2, pady=8)
 
-        def save():
-            self.db.execute('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', ('tax_percent', tax_e.get().strip()))
-            self.db.execute('INSERT OR REPLACE INTO settings(key,value) VALUES(?,?);', ('default_discount', disc_e.get().strip()))
-            messagebox.showinfo('Saved','Settings saved')
-        ttk.Button(f, text='Save Settings', command=save).grid(row=3, column=0, columnspan=2, pady=8)
-
     # ---------------- Helpers ----------------
     def _open_tab_by_name(self, name):
         for i in range(self.nb.index('end')):
@@ -3150,14 +3691,25 @@ class App:
         messagebox.showinfo('Info', f'Tab {name} not found')
 
     def _filter_inventory_low_stock(self):
-        med_rows = self.db.query("""SELECT p.id,p.name,p.sku,p.unit,c.name as category,m.name as manufacturer,p.sale_price as price,
-            COALESCE((SELECT SUM(quantity) FROM batches b WHERE b.product_id=p.id),0) AS stock FROM products p LEFT JOIN categories c ON p.category_id=c.id LEFT JOIN manufacturers m ON p.manufacturer_id=m.id WHERE p.is_medical=1 GROUP BY p.id HAVING stock<=5 ORDER BY p.name;""")
-        self._med_tree.delete(*self._med_tree.get_children())
-        for r in med_rows: self._med_tree.insert('', 'end', iid=r['id'], values=(r['id'], r['name'], r['sku'] or '', r.get('unit','') or '', r.get('category') or '', r.get('manufacturer') or '', f"{r['price']:.2f}", r['stock']))
-        non_rows = self.db.query("""SELECT p.id,p.name,p.sku,p.unit,c.name as category,m.name as manufacturer,p.sale_price as price,
-            COALESCE((SELECT SUM(quantity) FROM batches b WHERE b.product_id=p.id),0) AS stock FROM products p LEFT JOIN categories c ON p.category_id=c.id LEFT JOIN manufacturers m ON p.manufacturer_id=m.id WHERE p.is_medical=0 GROUP BY p.id HAVING stock<=5 ORDER BY p.name;""")
-        self._nonmed_tree.delete(*self._nonmed_tree.get_children())
-        for r in non_rows: self._nonmed_tree.insert('', 'end', iid=r['id'], values=(r['id'], r['name'], r['sku'] or '', r.get('unit','') or '', r.get('category') or '', r.get('manufacturer') or '', f"{r['price']:.2f}", r['stock']))
+        # one scan partitioned by is_medical instead of two near-identical
+        # aggregate queries; rows are split between the trees in Python
+        rows = self.db.query("""SELECT p.is_medical, p.id, p.name, COALESCE(p.sku,''), COALESCE(p.unit,''),
+            COALESCE(c.name,''), COALESCE(m.name,''), p.sale_price, COALESCE(SUM(b.quantity),0) AS stock
+            FROM products p
+            LEFT JOIN batches b ON b.product_id=p.id
+            LEFT JOIN categories c ON p.category_id=c.id
+            LEFT JOIN manufacturers m ON p.manufacturer_id=m.id
+            GROUP BY p.id HAVING stock<=5 ORDER BY p.name;""", raw=True)
+        med, non = [], []
+        for is_medical, pid, name, sku, unit, category, manufacturer, price, stock in rows:
+            (med if is_medical else non).append(
+                (pid, name, sku, unit, category, manufacturer, f"{price:.2f}", stock))
+        self._bulk_fill_tree(self._med_tree, med, use_iid=True)
+        self._bulk_fill_tree(self._nonmed_tree, non, use_iid=True)
+        # the trees now show a subset, so drop their filter caches
+        for tab_name in ('Medical Products', 'Non-Medical Products'):
+            getattr(self, '_tab_filter_cache', {}).pop(tab_name, None)
+            getattr(self, '_tab_is_full', {}).pop(tab_name, None)
         self._open_tab_by_name('Inventory')
         try:
             for child in self.tab_inventory.winfo_children():
@@ -3168,7 +3720,7 @@ class App:
 
     def _filter_inventory_near_expiry(self):
         self._batch_tree.delete(*self._batch_tree.get_children())
-        rows = self.db.query("""SELECT b.id, p.name as product, b.batch_no, b.quantity, b.expiry_date, s.name as supplier FROM batches b LEFT JOIN products p ON p.id=b.product_id LEFT JOIN suppliers s ON s.id=b.supplier_id WHERE b.expiry_date IS NOT NULL AND julianday(b.expiry_date)-julianday('now')<=30 AND b.quantity>0 ORDER BY b.expiry_date ASC;""")
+        rows = self.db.query("""SELECT b.id, p.name as product, b.batch_no, b.quantity, b.expiry_date, s.name as supplier FROM batches b LEFT JOIN products p ON p.id=b.product_id LEFT JOIN suppliers s ON s.id=b.supplier_id WHERE b.expiry_date IS NOT NULL AND b.expiry_date <= date('now','+30 day') AND b.quantity>0 ORDER BY b.expiry_date ASC;""")
         for r in rows: self._batch_tree.insert('', 'end', values=(r['id'], r['product'], r['batch_no'] or '', r['quantity'], r['expiry_date'] or '', r['supplier'] or ''))
         self._open_tab_by_name('Inventory')
         try:
@@ -3193,7 +3745,7 @@ class App:
         try:
             self._filter_inventory_near_expiry()
         except Exception:
-            rows = self.db.query("""SELECT b.id, p.name AS product, b.batch_no, b.quantity, b.expiry_date FROM batches b JOIN products p ON p.id=b.product_id WHERE b.expiry_date IS NOT NULL AND julianday(b.expiry_date)-julianday('now')<=30 AND b.quantity>0 ORDER BY b.expiry_date ASC;""")
+            rows = self.db.query("""SELECT b.id, p.name AS product, b.batch_no, b.quantity, b.expiry_date FROM batches b JOIN products p ON p.id=b.product_id WHERE b.expiry_date IS NOT NULL AND b.expiry_date <= date('now','+30 day') AND b.quantity>0 ORDER BY b.expiry_date ASC;""")
             dlg = tk.Toplevel(self.root); dlg.title('Near Expiry (<=30 days)'); dlg.geometry('800x420')
             tree = ttk.Treeview(dlg, columns=('id','product','batch_no','quantity','expiry'), show='headings'); tree.pack(fill='both', expand=True, padx=8, pady=8)
             for c in ('id','product','batch_no','quantity','expiry'): tree.heading(c, text=c.capitalize()); tree.column(c,width=150,anchor='w')
@@ -3202,16 +3754,16 @@ class App:
 
     # autocomplete helpers
     def _supplier_suggestions(self, term):
-        rows = self.db.query('SELECT name FROM suppliers WHERE name LIKE ? ORDER BY name LIMIT 10;', (f'%{term}%',))
-        return [r['name'] for r in rows]
+        return self._name_suggestions('suppliers', term)
 
     def _manufacturer_suggestions(self, term):
-        rows = self.db.query('SELECT name FROM manufacturers WHERE name LIKE ? ORDER BY name LIMIT 10;', (f'%{term}%',))
-        return [r['name'] for r in rows]
+        return self._name_suggestions('manufacturers', term)
 
     def _product_suggestions(self, term):
-        rows = self.db.query('SELECT name, sale_price FROM products WHERE name LIKE ? ORDER BY name LIMIT 12;', (f'%{term}%',))
-        return [r['name'] for r in rows]
+        return self._memo_suggest('product', term, lambda: [
+            n for (n,) in self.db.query(
+                'SELECT name FROM products WHERE name LIKE ? ORDER BY name LIMIT 12;',
+                (f'%{term}%',), raw=True)])
 
 
     # ---------------- Seeder ----------------
@@ -3219,27 +3771,36 @@ class App:
         try:
             cnt = self.db.query('SELECT COUNT(*) AS c FROM products;')[0]['c']
             if cnt > 0: return
-            man1 = self.db.execute('INSERT OR IGNORE INTO manufacturers(name,contact) VALUES(?,?);', ('GoodPharma','contact1'))
-            sup1 = self.db.execute('INSERT OR IGNORE INTO suppliers(name,phone) VALUES(?,?);', ('SupplyCo','1234567890'))
-            self.db.execute('INSERT OR IGNORE INTO formulas(name,composition) VALUES(?,?);', ('Paracetamol 500mg','Paracetamol'))
-            self.db.execute('INSERT OR IGNORE INTO categories(name) VALUES(?);', ('Analgesics',))
-            pid1 = self.db.execute('INSERT INTO products(name,sku,is_medical,unit,sale_price) VALUES(?,?,?,?,?);', ('Paracetamol 500mg','PARA500',1,'tablet',0.50))
-            pid2 = self.db.execute('INSERT INTO products(name,sku,is_medical,unit,sale_price) VALUES(?,?,?,?,?);', ('Ibuprofen 200mg','IBU200',1,'tablet',0.75))
-            pid3 = self.db.execute('INSERT INTO products(name,sku,is_medical,unit,sale_price) VALUES(?,?,?,?,?);', ('Cough Syrup 100ml','COUGH100',1,'ml',3.50))
-            self.db.execute('INSERT INTO batches(product_id,quantity,expiry_date,created_at) VALUES(?,?,?,?);', (pid1,50, (datetime.now()+timedelta(days=20)).strftime('%Y-%m-%d'), now_str()))
-            self.db.execute('INSERT INTO batches(product_id,quantity,expiry_date,created_at) VALUES(?,?,?,?);', (pid2,10, (datetime.now()+timedelta(days=200)).strftime('%Y-%m-%d'), now_str()))
-            self.db.execute('INSERT INTO batches(product_id,quantity,expiry_date,created_at) VALUES(?,?,?,?);', (pid3,5, (datetime.now()+timedelta(days=10)).strftime('%Y-%m-%d'), now_str()))
-            cid = self.db.execute('INSERT INTO customers(name,phone) VALUES(?,?);', ('Alice','5551112222'))
-            sale1 = self.db.execute('INSERT INTO sales(user_id,total,customer_id,customer_name,customer_phone,created_at) VALUES(?,?,?,?,?,?);', (1, 15.0, cid, 'Alice','5551112222', now_str()))
-            si = self.db.execute('INSERT INTO sale_items(sale_id,product_id,quantity,price) VALUES(?,?,?,?);', (sale1, pid1, 2, 0.5))
-            batches = self.db.query('SELECT id,quantity FROM batches WHERE product_id=? ORDER BY created_at ASC;', (pid1,))
-            need = 2
-            for b in batches:
-                take = min(need, b['quantity'])
-                if take>0:
-                    self.db.execute('UPDATE batches SET quantity=quantity-? WHERE id=?;', (take, b['id']))
-                    need -= take
-                if need<=0: break
+            # the whole seed is one transaction: one commit/fsync instead of
+            # one per statement
+            with self.db.transaction() as cur:
+                cur.execute('INSERT OR IGNORE INTO manufacturers(name,contact) VALUES(?,?);', ('GoodPharma','contact1'))
+                cur.execute('INSERT OR IGNORE INTO suppliers(name,phone) VALUES(?,?);', ('SupplyCo','1234567890'))
+                cur.execute('INSERT OR IGNORE INTO formulas(name,composition) VALUES(?,?);', ('Paracetamol 500mg','Paracetamol'))
+                cur.execute('INSERT OR IGNORE INTO categories(name) VALUES(?);', ('Analgesics',))
+                cur.executemany('INSERT INTO products(name,sku,is_medical,unit,sale_price) VALUES(?,?,?,?,?);', [
+                    ('Paracetamol 500mg','PARA500',1,'tablet',0.50),
+                    ('Ibuprofen 200mg','IBU200',1,'tablet',0.75),
+                    ('Cough Syrup 100ml','COUGH100',1,'ml',3.50),
+                ])
+                cur.execute("SELECT sku, id FROM products WHERE sku IN ('PARA500','IBU200','COUGH100');")
+                ids = {r['sku']: r['id'] for r in cur.fetchall()}
+                pid1, pid2, pid3 = ids['PARA500'], ids['IBU200'], ids['COUGH100']
+                cur.executemany('INSERT INTO batches(product_id,quantity,expiry_date,created_at) VALUES(?,?,?,?);', [
+                    (pid1, 50, (datetime.now()+timedelta(days=20)).strftime('%Y-%m-%d'), now_str()),
+                    (pid2, 10, (datetime.now()+timedelta(days=200)).strftime('%Y-%m-%d'), now_str()),
+                    (pid3, 5, (datetime.now()+timedelta(days=10)).strftime('%Y-%m-%d'), now_str()),
+                ])
+                cur.execute('INSERT INTO customers(name,phone) VALUES(?,?);', ('Alice','5551112222'))
+                cid = cur.lastrowid
+                cur.execute('INSERT INTO sales(user_id,total,customer_id,customer_name,customer_phone,created_at) VALUES(?,?,?,?,?,?);', (1, 15.0, cid, 'Alice','5551112222', now_str()))
+                sale1 = cur.lastrowid
+                cur.execute('INSERT INTO sale_items(sale_id,product_id,quantity,price) VALUES(?,?,?,?);', (sale1, pid1, 2, 0.5))
+                # same window-function FIFO the checkout path uses: one query
+                # computes each batch's take, one executemany applies them
+                cur.execute(SQL_FIFO_TAKES, (pid1, 2, 2))
+                cur.executemany('UPDATE batches SET quantity=quantity-? WHERE id=?;',
+                                [(r['take'], r['id']) for r in cur.fetchall()])
         except Exception as e:
             print('Seeder error', e)
 
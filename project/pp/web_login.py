@@ -1,27 +1,59 @@
 from flask import Flask, render_template, request
-import sqlite3, hashlib, os, subprocess, sys
+import sqlite3, hashlib, os, queue, subprocess, sys
 
 BASE_DIR = os.path.dirname(__file__)
 DB_PATH = os.path.join(BASE_DIR, "pharmacy.db")
 
 # Hashing function (same as your Tkinter app)
 def hash_pw(pw: str) -> str:
-    import hashlib
     return hashlib.sha256(pw.encode()).hexdigest()
 
+# Small connection pool: reuse handles across requests instead of paying
+# sqlite3_open + WAL setup per login attempt.
+_POOL = queue.Queue(maxsize=8)
+
+def _get_con():
+    try:
+        return _POOL.get_nowait()
+    except queue.Empty:
+        con = sqlite3.connect(DB_PATH, check_same_thread=False)
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA synchronous=NORMAL;")
+        return con
+
+def _put_con(con):
+    try:
+        _POOL.put_nowait(con)
+    except queue.Full:
+        con.close()
+
 def check_login(username, password, role):
-    con = sqlite3.connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    cur = con.cursor()
-    cur.execute("SELECT * FROM users WHERE username=?;", (username,))
-    row = cur.fetchone()
-    con.close()
+    con = _get_con()
+    try:
+        row = con.execute(
+            "SELECT password_hash, role FROM users WHERE username=? LIMIT 1;",
+            (username,)).fetchone()
+    finally:
+        _put_con(con)
     if not row:
         return False
-    return row["password_hash"] == hash_pw(password) and row["role"] == role
+    return row[0] == hash_pw(password) and row[1] == role
 
 app = Flask(__name__, template_folder=".")
 
+# Handle of the spawned dashboard: interpreter startup plus the tkinter/
+# reportlab imports are the expensive part of a login, so reuse a live
+# instance instead of launching another one per successful login.
+_dashboard_proc = None
+
+def _launch_dashboard():
+    global _dashboard_proc
+    if _dashboard_proc is not None and _dashboard_proc.poll() is None:
+        return  # still running
+    _dashboard_proc = subprocess.Popen(
+        [sys.executable, "mainproject.py"],
+        close_fds=True, start_new_session=True)
+
 @app.route("/", methods=["GET", "POST"])
 def login():
     if request.method == "POST":
@@ -31,7 +63,7 @@ def login():
 
         if check_login(username, password, role):
             # Launch Tkinter dashboard
-            subprocess.Popen([sys.executable, "mainproject.py"])
+            _launch_dashboard()
             return """
             <h2 style="font-family:sans-serif;color:green;">✅ Login successful</h2>
             <p>The Tkinter dashboard is opening. You can now close this tab.</p>
@@ -44,4 +76,9 @@ def login():
     return render_template("login.html")
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
+    try:
+        # production WSGI server when available: threaded, no debug reloader
+        from waitress import serve
+        serve(app, host="127.0.0.1", port=5000, threads=8)
+    except ImportError:
+        app.run(port=5000)